@@ -1,20 +1,29 @@
 #!/usr/bin/env python3
 
 import urllib3
-import pandas as pd
-import math
-import json
 from pathlib import Path
 
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response
 from sse_starlette.sse import EventSourceResponse
 import asyncio
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
 import bcrypt
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 from stock_scrapper import TickerAnalyzer
+from watchlist import WatchlistRefresher
+from serialization import normalize, dumps, dumps_bytes
+import tickers_constants
+from render_pool import render_pool
+from ocr_pool import ocr_pool
+from image_store import image_store
+from rate_limit import rate_limiter
+from snapshot_store import snapshot_store
+import metrics
 
 urllib3.disable_warnings()
 
@@ -25,116 +34,313 @@ SECRET_PIN = PIN_FILE.read_text().strip().encode()
 
 
 ta = TickerAnalyzer()
-app = FastAPI()
+watchlist = WatchlistRefresher(ta)
+metrics.register_stats(ta, render_pool, ocr_pool)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    watchlist.start()
+    yield
+    await watchlist.stop()
+    await asyncio.to_thread(snapshot_store.flush)
+
+
+app = FastAPI(lifespan=lifespan)
+
+ALIAS_TO_NAME = {"zacks": "Zacks", "tv": "TradingView", "yf": "Yahoo Finance", 
+                 "finviz": "Finviz", "sws": "Simply Wall Street", "sa": "StockAnalysis", 
+                 "rdt": "Reddit"}
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-def sanitize_for_json(obj):
-    if isinstance(obj, dict):
-        return {k: sanitize_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [sanitize_for_json(v) for v in obj]
-    elif isinstance(obj, pd.Timestamp):
-        return obj.isoformat()
-    elif isinstance(obj, float):
-        if math.isnan(obj) or math.isinf(obj):
-            return None
-        return obj
-    return obj
+
+app.add_middleware(metrics.InFlightMiddleware)
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps_bytes(content)
 
 
-def handle_image(image_base64):
-    image_data = None
-    if image_base64:
-        image_data = f"data:image/png;base64,{image_base64}"
+def handle_image(image_id):
+    image_url = None
+    if image_id:
+        image_url = f"/img/{image_id}"
 
-    return image_data
+    return image_url
 
 
 @app.post("/validate_pin")
-def validate_pin(payload: dict):
+async def validate_pin(payload: dict):
     user_pin = payload.get("pin", "").encode()
-    if bcrypt.checkpw(user_pin, SECRET_PIN):
-        ta.clear_cache()
+    # bcrypt is deliberately slow, keep it off the event loop
+    if await asyncio.to_thread(bcrypt.checkpw, user_pin, SECRET_PIN):
+        # a new session starts from fresh data, so the SQLite tier (shared by every worker) goes too
+        await asyncio.to_thread(ta.clear_cache, persistent=True)
         return {"success": True}
     return {"success": False}
 
 
+@app.get("/cache_stats")
+def cache_stats():
+    return FastJSONResponse(ta.cache_stats())
+
+
+@app.get("/watchlist")
+def watchlist_status():
+    return FastJSONResponse(watchlist.status())
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(content=metrics.render_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
+@app.get("/rate_limits")
+def rate_limits():
+    return FastJSONResponse(rate_limiter.stats())
+
+
+@app.get("/history/{ticker}")
+async def history(ticker: str, metric: str=None, source: str=None, days: int=None):
+    # without a metric, lists what has been recorded for the ticker
+    start = datetime.now(timezone.utc) - timedelta(days=days) if days else None
+    try:
+        if metric is None:
+            return FastJSONResponse(await asyncio.to_thread(snapshot_store.metrics, ticker, source))
+        frame = await asyncio.to_thread(snapshot_store.history, ticker, metric, source, start)
+    except RuntimeError as e:
+        return FastJSONResponse({"error": str(e)}, status_code=503)
+    return FastJSONResponse(normalize(frame.to_dict(orient="records")))
+
+
+@app.get("/screen")
+async def screen(metric: str, source: str=None, on: str=None, min: float=None, max: float=None):
+    try:
+        frame = await asyncio.to_thread(snapshot_store.screen, metric, source, on, min, max)
+    except RuntimeError as e:
+        return FastJSONResponse({"error": str(e)}, status_code=503)
+    return FastJSONResponse(normalize(frame.to_dict(orient="records")))
+
+
+@app.get("/render_stats")
+def render_stats():
+    return FastJSONResponse({"render": render_pool.stats(), "ocr": ocr_pool.stats()})
+
+
 @app.get("/")
 def root():
     try:
         with open("static/index.html", "r") as f:
             return HTMLResponse(content=f.read())
     except FileNotFoundError:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=404,
             content={"error": "static/index.html not found"}
         )
 
 
+@app.get("/img/{image_id}")
+async def image(image_id: str, request: Request, format: str="png", width: int=None):
+    etag = f'"{image_id}-{format}-{width or 0}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    # an evicted image must 404 even for a client still holding its ETag
+    if not await asyncio.to_thread(image_store.has, image_id, format):
+        return FastJSONResponse(status_code=404, content={"error": "image not found"})
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        data = await asyncio.to_thread(image_store.get, image_id, format, width)
+    except Exception as e:
+        return FastJSONResponse(status_code=415, content={"error": f"Cannot encode image as {format}: {e}"})
+    if data is None:
+        return FastJSONResponse(status_code=404, content={"error": "image not found"})
+
+    return Response(content=data, media_type=f"image/{format}", headers=headers)
+
+
 @app.get("/Zacks/{ticker}")
-def zacks(ticker: str):
-    summary = ta.get_zacks_info(ticker)
+async def zacks(ticker: str):
+    summary = dict(await ta.aget_source_info("zacks", ticker))
 
-    image_base64 = summary.pop("image", None)
+    image_id = summary.pop("image", None)
 
-    return JSONResponse({
-        "summary": sanitize_for_json(summary),
-        "image": handle_image(image_base64)
+    return FastJSONResponse({
+        "summary": summary,
+        "image": handle_image(image_id)
     })
 
 
 @app.get("/TradingView/{ticker}")
-def tradingview(ticker: str):
-    summary = ta.get_tradingview_info(ticker)
+async def tradingview(ticker: str):
+    summary = await ta.aget_source_info("tv", ticker)
 
-    return JSONResponse({
-        "summary": sanitize_for_json(summary),
+    return FastJSONResponse({
+        "summary": summary,
     })
 
 
 @app.get("/YahooFinance/{ticker}")
-def yahoofinance(ticker: str):
-    summary = ta.get_yf_info(ticker)
-    return JSONResponse({"summary": sanitize_for_json(summary)})
+async def yahoofinance(ticker: str):
+    summary = await ta.aget_source_info("yf", ticker)
+    return FastJSONResponse({"summary": summary})
 
 
 @app.get("/Finviz/{ticker}")
-def finviz(ticker: str):
-    summary = ta.get_finviz_info(ticker)
-    return JSONResponse({"summary": sanitize_for_json(summary)})
+async def finviz(ticker: str):
+    summary = await ta.aget_source_info("finviz", ticker)
+    return FastJSONResponse({"summary": summary})
 
 
 @app.get("/SimplyWallStreet/{ticker}")
-def simplywallstreet(ticker: str):
-    summary = ta.get_sws_info(ticker)
+async def simplywallstreet(ticker: str):
+    summary = dict(await ta.aget_source_info("sws", ticker))
 
-    image_base64 = summary.pop("image", None)
+    image_id = summary.pop("image", None)
 
-    return JSONResponse({
-        "summary": sanitize_for_json(summary),
-        "image": handle_image(image_base64)
+    return FastJSONResponse({
+        "summary": summary,
+        "image": handle_image(image_id)
     })
 
 
 @app.get("/StockAnalysis/{ticker}")
-def stockanalysis(ticker: str):
-    summary = ta.get_sa_info(ticker)
+async def stockanalysis(ticker: str):
+    summary = dict(await ta.aget_source_info("sa", ticker))
 
-    image_base64 = summary.pop("image", None)
+    image_id = summary.pop("image", None)
 
-    return JSONResponse({
-        "summary": sanitize_for_json(summary),
-        "image": handle_image(image_base64)
+    return FastJSONResponse({
+        "summary": summary,
+        "image": handle_image(image_id)
     })
 
+
+def _is_positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+@app.post("/batch")
+async def batch(payload: dict):
+    tickers = payload.get("tickers", [])
+    sources = payload.get("sources") or list(ALIAS_TO_NAME)
+    stream_format = payload.get("format", "ndjson")
+
+    if not isinstance(tickers, list) or not all(isinstance(ticker, str) and ticker for ticker in tickers):
+        return FastJSONResponse(status_code=400, content={"error": "tickers must be a list of ticker symbols"})
+    if not tickers or len(tickers) > tickers_constants.BATCH_MAX_TICKERS:
+        return FastJSONResponse(status_code=400, content={"error": f"Provide 1-{tickers_constants.BATCH_MAX_TICKERS} tickers"})
+    if not isinstance(sources, list):
+        return FastJSONResponse(status_code=400, content={"error": "sources must be a list of source aliases"})
+    unknown = [source for source in sources if source not in ALIAS_TO_NAME]
+    if unknown:
+        return FastJSONResponse(status_code=400, content={"error": f"Unknown sources: {', '.join(map(str, unknown))}"})
+
+    # checked here, once the stream has started a bad limit could only break it
+    max_concurrency = payload.get("max_concurrency")
+    if max_concurrency is not None and not _is_positive_int(max_concurrency):
+        return FastJSONResponse(status_code=400, content={"error": "max_concurrency must be a positive integer"})
+    source_concurrency = payload.get("source_concurrency")
+    if source_concurrency is not None and (not isinstance(source_concurrency, dict)
+                                           or not all(_is_positive_int(limit) for limit in source_concurrency.values())):
+        return FastJSONResponse(status_code=400, content={"error": "source_concurrency must map sources to positive integers"})
+
+    async def results():
+        async for ticker, source, summary in ta.analyze_batch(tickers, sources, max_concurrency, source_concurrency):
+            summary = dict(summary or {})
+            image_id = summary.pop("image", None)
+            yield {
+                "ticker": ticker,
+                "source": ALIAS_TO_NAME[source],
+                "summary": summary,
+                "image": handle_image(image_id)
+            }
+
+    if stream_format == "sse":
+        async def event_generator():
+            async for result in results():
+                yield {"event": "result", "data": dumps(result)}
+            yield {"event": "status", "data": dumps({"data": "Batch analysis finished"})}
+
+        return EventSourceResponse(event_generator())
+
+    async def ndjson_generator():
+        async for result in results():
+            yield dumps_bytes(result) + b"\n"
+
+    return StreamingResponse(ndjson_generator(), media_type="application/x-ndjson")
+
+
+@app.websocket("/stream/{ticker}")
+async def stream(websocket: WebSocket, ticker: str):
+    # one channel per ticker: "field" messages as each summary field is scraped, a "summary" message per source
+    # (followed by the source image as a binary frame when it has one) and a final "done"
+    await websocket.accept()
+
+    sources = [src for src in websocket.query_params.get("sources", ",".join(ALIAS_TO_NAME)).split(",") if src in ALIAS_TO_NAME]
+    loop = asyncio.get_running_loop()
+    outbox = asyncio.Queue()
+
+    def field_reporter(source):
+        def on_field(key, value):
+            if key != "image":
+                loop.call_soon_threadsafe(outbox.put_nowait, ("field", source, key, value))
+        return on_field
+
+    async def run_source(source):
+        summary = await ta.aget_source_info(source, ticker, field_reporter(source))
+        outbox.put_nowait(("summary", source, None, summary))
+
+    tasks = [asyncio.create_task(run_source(source)) for source in sources]
+    try:
+        pending = len(tasks)
+        while pending:
+            kind, source, key, value = await outbox.get()
+            if kind == "field":
+                await websocket.send_text(dumps({
+                    "type": "field",
+                    "source": ALIAS_TO_NAME[source],
+                    "key": key,
+                    "value": value
+                }))
+                continue
+
+            pending -= 1
+            summary = dict(value or {})
+            image_id = summary.pop("image", None)
+            image_bytes = await asyncio.to_thread(image_store.get, image_id) if image_id else None
+            await websocket.send_text(dumps({
+                "type": "summary",
+                "source": ALIAS_TO_NAME[source],
+                "summary": summary,
+                "image": bool(image_bytes)
+            }))
+            if image_bytes:
+                await websocket.send_bytes(image_bytes)
+
+        await websocket.send_text(dumps({"type": "done"}))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 @app.get("/Reddit/{ticker}")
-def reddit(ticker: str):
-    summary = ta.get_rdt_info(ticker)
-    return JSONResponse({"summary": sanitize_for_json(summary)})
+async def reddit(ticker: str):
+    summary = await ta.aget_source_info("rdt", ticker)
+    return FastJSONResponse({"summary": summary})
 
 
 
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=1024)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -146,59 +352,50 @@ app.add_middleware(
 
 @app.get("/ChatGPTStream/{ticker}")
 async def chatgpt_stream(ticker: str, request: Request):
-    alias_to_name = {"zacks": "Zacks", "tv": "TradingView", "yf": "Yahoo Finance", 
-                     "finviz": "Finviz", "sws": "Simply Wall Street", "sa": "StockAnalysis", 
-                     "rdt": "Reddit"}
-
     async def event_generator():
-        finished = {k: False for k in alias_to_name}
-        total_sources = len(finished)
-        removed = []
+        total_sources = len(ALIAS_TO_NAME)
+        progress = asyncio.Queue()
+        task = asyncio.create_task(ta.gather_chatgpt_info(ticker, progress))
         try:
-            task = asyncio.create_task(ta.gather_chatgpt_info(ticker, finished))
-            num_no_finished = total_sources
-            while num_no_finished > 0:
-                if await request.is_disconnected():
-                    break
+            num_finished = 0
+            while (src := await progress.get()) is not None:
+                num_finished += 1
+                percent = int((num_finished / total_sources) * 100)
+                yield {
+                    "event": "progress",
+                    "data": dumps({"source": ALIAS_TO_NAME[src], "progress": percent})
+                }
 
-                finished_tasks = [src for src, done in finished.items() if done and src not in removed]
-                num_no_finished -= len(finished_tasks)
-
-                for src in finished_tasks:
-                    removed.append(src)
-                    percent = int((len(removed) / total_sources) * 100)
-                    yield {
-                        "event": "progress",
-                        "data": json.dumps({"source": alias_to_name[src], "progress": percent})
-                    }
-                
-                if num_no_finished == 0:
-                    yield {
-                        "event": "status",
-                        "data": json.dumps({"data": "Running ChatGPT analysis..."})
-                    }
-
-                await asyncio.sleep(0.1)
+            yield {
+                "event": "status",
+                "data": dumps({"data": "Running ChatGPT analysis..."})
+            }
 
             sources_data = await task
+            if isinstance(sources_data, dict):
+                raise ValueError(sources_data["msg"])
 
-            for chunk in ta.chatgpt.get_ticker_info(ticker, *sources_data):
+            async for chunk in ta.stream_analysis(ticker, sources_data):
                 if await request.is_disconnected():
                     break
                 yield {
                     "event": "stream",
-                    "data": json.dumps({"chunk": chunk})
+                    "data": dumps({"chunk": chunk})
                 }
 
             yield {
                 "event": "status",
-                "data": json.dumps({"data": "ChatGPT analysis was successful!"})
+                "data": dumps({"data": "ChatGPT analysis was successful!"})
             }
 
         except Exception as e:
             yield {
                 "event": "error",
-                "data": json.dumps({"error": str(e)})
+                "data": dumps({"error": str(e)})
             }
+        finally:
+            # sse-starlette cancels the generator on disconnect - don't leave the gather running
+            if not task.done():
+                task.cancel()
 
     return EventSourceResponse(event_generator())
\ No newline at end of file
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import types
+import pickle
+import asyncio
+import argparse
+import resource
+import tempfile
+import threading
+from statistics import mean
+
+# keep benchmark runs away from the app's persistent cache
+os.environ.setdefault("STOCKS_CACHE_DB", "")
+
+import httpx
+import requests
+
+import tickers_constants
+import stock_scrapper
+from stock_scrapper import TickerAnalyzer
+from http_pool import HttpPool, http_pool
+from render_pool import render_pool
+from ocr_pool import ocr_pool
+from sws_index import SwsIndex, TvExchangeIndex
+from rate_limit import rate_limiter
+from snapshot_store import snapshot_store
+
+DEFAULT_TICKERS = ["AAPL", "MSFT", "NVDA", "KO", "TEVA"]
+ROUTES = {
+    "zacks": "/Zacks/{}",
+    "tv": "/TradingView/{}",
+    "yf": "/YahooFinance/{}",
+    "finviz": "/Finviz/{}",
+    "sws": "/SimplyWallStreet/{}",
+    "sa": "/StockAnalysis/{}",
+    "rdt": "/Reddit/{}",
+}
+
+
+def _request_key(method, url, params=None, body=None):
+    params = sorted((params or {}).items()) if isinstance(params, dict) else params
+    return method.upper(), str(url), repr(params), body
+
+
+class Fixtures:
+    # everything the sources fetch, keyed by request: pooled httpx calls, requests-based libraries
+    # (finvizfinance, tradingview_ta), yfinance Ticker attributes and rendered pages
+    def __init__(self, path: str, upstream_delay: float=0.0):
+        self.path = path
+        self.upstream_delay = upstream_delay
+        self.data = {"tickers": [], "http": {}, "requests": {}, "yf": {}, "pages": {}}
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        with open(self.path, "rb") as f:
+            self.data = pickle.load(f)
+        return self
+
+    def save(self):
+        with open(self.path, "wb") as f:
+            pickle.dump(self.data, f)
+
+    def store(self, kind, key, value, elapsed):
+        with self._lock:
+            self.data[kind][key] = (value, elapsed)
+
+    def fetch(self, kind, key):
+        entry = self.data[kind].get(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        value, elapsed = entry
+        if self.upstream_delay:
+            time.sleep(elapsed * self.upstream_delay)
+        return value
+
+    async def afetch(self, kind, key):
+        entry = self.data[kind].get(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        value, elapsed = entry
+        if self.upstream_delay:
+            await asyncio.sleep(elapsed * self.upstream_delay)
+        return value
+
+
+class RecordingTicker:
+    # proxies yf.Ticker and remembers every attribute and call result the sources touch
+    def __init__(self, fixtures: Fixtures, symbol: str, real_ticker):
+        self._fixtures = fixtures
+        self._symbol = symbol
+        self._real = real_ticker
+
+    def __dir__(self):
+        names = dir(self._real)
+        self._fixtures.store("yf", (self._symbol, "__dir__"), names, 0.0)
+        return names
+
+    def __getattr__(self, name):
+        start = time.perf_counter()
+        value = getattr(self._real, name)
+        if not callable(value):
+            self._fixtures.store("yf", (self._symbol, name), value, time.perf_counter() - start)
+            return value
+
+        def call(*args):
+            call_start = time.perf_counter()
+            result = value(*args)
+            # yfinance's namedtuples are defined inside functions and don't pickle
+            stored = types.SimpleNamespace(**result._asdict()) if hasattr(result, "_asdict") else result
+            self._fixtures.store("yf", (self._symbol, name, args), stored, time.perf_counter() - call_start)
+            return result
+
+        return call
+
+
+class ReplayTicker:
+    def __init__(self, fixtures: Fixtures, symbol: str):
+        self._fixtures = fixtures
+        self._symbol = symbol
+
+    def __dir__(self):
+        return self._fixtures.fetch("yf", (self._symbol, "__dir__")) or []
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if (self._symbol, name) in self._fixtures.data["yf"]:
+            return self._fixtures.fetch("yf", (self._symbol, name))
+
+        def call(*args):
+            result = self._fixtures.fetch("yf", (self._symbol, name, args))
+            if result is None:
+                raise ValueError(f"No recorded yfinance result for {self._symbol}.{name}{args}")
+            return result
+
+        return call
+
+
+class RecordingRenderer:
+    def __init__(self, fixtures: Fixtures, renderer):
+        self.fixtures = fixtures
+        self.renderer = renderer
+
+    def render(self, url, wait_for=None, timeout=None):
+        start = time.perf_counter()
+        img_bytes = self.renderer.render(url, wait_for, timeout)
+        self.fixtures.store("pages", (url, wait_for), img_bytes, time.perf_counter() - start)
+        return img_bytes
+
+    def close(self):
+        self.renderer.close()
+
+
+class ReplayRenderer:
+    def __init__(self, fixtures: Fixtures):
+        self.fixtures = fixtures
+
+    def render(self, url, wait_for=None, timeout=None):
+        img_bytes = self.fixtures.fetch("pages", (url, wait_for))
+        if img_bytes is None:
+            raise RuntimeError(f"No recorded page for {url}")
+        return img_bytes
+
+    def close(self):
+        pass
+
+
+def install_recorder(fixtures: Fixtures):
+    real_request = HttpPool._request
+    real_session_request = requests.Session.request
+    real_ticker = stock_scrapper.yf.Ticker
+    real_renderer_factory = render_pool._renderer_factory
+
+    async def record_request(self, method, url, proxy=None, **kwargs):
+        start = time.perf_counter()
+        response = await real_request(self, method, url, proxy=proxy, **kwargs)
+        params = kwargs.get("params")
+        # the same URL the client puts on the wire, which is what the replay transport sees
+        key = _request_key(method, httpx.URL(url).copy_merge_params(params) if params else httpx.URL(url))
+        fixtures.store("http", key, (response.status_code, dict(response.headers), response.content), time.perf_counter() - start)
+        return response
+
+    def record_session_request(self, method, url, params=None, data=None, json=None, **kwargs):
+        start = time.perf_counter()
+        response = real_session_request(self, method, url, params=params, data=data, json=json, **kwargs)
+        key = _request_key(method, url, params, repr(json if json is not None else data))
+        fixtures.store("requests", key, (response.status_code, dict(response.headers), response.content), time.perf_counter() - start)
+        return response
+
+    HttpPool._request = record_request
+    requests.Session.request = record_session_request
+    stock_scrapper.yf.Ticker = lambda symbol, *args, **kwargs: RecordingTicker(fixtures, symbol, real_ticker(symbol, *args, **kwargs))
+    render_pool._renderer_factory = lambda: RecordingRenderer(fixtures, real_renderer_factory())
+
+
+def install_replayer(fixtures: Fixtures):
+    # pooled httpx clients keep their semaphores and rate limiter, only the transport is swapped
+    async def handle(request: httpx.Request):
+        recorded = await fixtures.afetch("http", _request_key(request.method, request.url))
+        if recorded is None:
+            return httpx.Response(404, request=request)
+        status, headers, content = recorded
+        headers = {k: v for k, v in headers.items() if k.lower() not in ("content-encoding", "transfer-encoding", "content-length")}
+        return httpx.Response(status, headers=headers, content=content, request=request)
+
+    def replay_session_request(self, method, url, params=None, data=None, json=None, **kwargs):
+        recorded = fixtures.fetch("requests", _request_key(method, url, params, repr(json if json is not None else data)))
+        response = requests.Response()
+        response.url = url
+        if recorded is None:
+            response.status_code = 404
+            response._content = b""
+            return response
+        status, headers, content = recorded
+        response.status_code = status
+        response.headers = requests.structures.CaseInsensitiveDict(headers)
+        response.headers.pop("Content-Encoding", None)
+        response._content = content
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or "utf-8"
+        return response
+
+    def replay_client(self, host, proxy):
+        client = self._clients.get((host, None))
+        if client is None:
+            client = self._clients[(host, None)] = httpx.AsyncClient(transport=httpx.MockTransport(handle), follow_redirects=True)
+        return client
+
+    HttpPool._client = replay_client
+    requests.Session.request = replay_session_request
+    stock_scrapper.yf.Ticker = lambda symbol, *args, **kwargs: ReplayTicker(fixtures, symbol)
+    render_pool._renderer_factory = lambda: ReplayRenderer(fixtures)
+
+
+def new_analyzer(index_dir: str):
+    # a fresh analyzer with throwaway ticker indexes, so every run starts from the same state
+    analyzer = TickerAnalyzer()
+    analyzer.sws.index = SwsIndex(path=os.path.join(index_dir, "sws_index.json"))
+    analyzer.tv.index = TvExchangeIndex(path=os.path.join(index_dir, "tv_exchange_index.json"))
+    return analyzer
+
+
+def reset(analyzer, index_dir: str):
+    analyzer.clear_cache()
+    render_pool.clear()
+    ocr_pool.clear()
+    for name in os.listdir(index_dir):
+        os.remove(os.path.join(index_dir, name))
+
+
+def percentiles(samples: list):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(mean(ordered) * 1000, 1),
+        "p50_ms": round(pick(0.50) * 1000, 1),
+        "p95_ms": round(pick(0.95) * 1000, 1),
+        "p99_ms": round(pick(0.99) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def bench_sources(analyzer, tickers: list, sources: list, index_dir: str, repeat: int):
+    # cold Source.get_ticker_info latency, one call at a time
+    samples = {source: [] for source in sources}
+    for _ in range(repeat):
+        reset(analyzer, index_dir)
+        for ticker in tickers:
+            for source in sources:
+                start = time.perf_counter()
+                analyzer.sources[source].lookup(ticker)
+                samples[source].append(time.perf_counter() - start)
+    return {source: percentiles(values) for source, values in samples.items()}
+
+
+async def bench_gather(analyzer, tickers: list, index_dir: str, repeat: int):
+    cold, warm = [], []
+    for _ in range(repeat):
+        reset(analyzer, index_dir)
+        for ticker in tickers:
+            start = time.perf_counter()
+            await analyzer.gather_chatgpt_info(ticker)
+            cold.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await analyzer.gather_chatgpt_info(ticker)
+            warm.append(time.perf_counter() - start)
+    return {"cold": percentiles(cold), "warm": percentiles(warm)}
+
+
+async def bench_routes(app, analyzer, tickers: list, sources: list, index_dir: str, clients: int, requests_per_client: int):
+    # N concurrent clients, each walking the ticker x route list, against the ASGI app in process
+    paths = [ROUTES[source].format(ticker) for ticker in tickers for source in sources]
+    results = {}
+    for phase in ("cold", "warm"):
+        if phase == "cold":
+            reset(analyzer, index_dir)
+        latencies = []
+        failures = 0
+
+        async def client_loop(client_id):
+            nonlocal failures
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for i in range(requests_per_client):
+                    path = paths[(client_id + i) % len(paths)]
+                    start = time.perf_counter()
+                    response = await client.get(path)
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client_id) for client_id in range(clients)))
+        elapsed = time.perf_counter() - start
+        results[phase] = dict(percentiles(latencies), throughput_rps=round(len(latencies) / elapsed, 1), failures=failures)
+    return results
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS; children covers the OCR worker processes once they exit
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def print_table(title: str, rows: dict):
+    print(f"\n## {title}")
+    for name, stats in rows.items():
+        print(f"{name:>12}  " + "  ".join(f"{key}={value}" for key, value in stats.items()))
+
+
+def record(args):
+    fixtures = Fixtures(args.fixtures)
+    install_recorder(fixtures)
+    with tempfile.TemporaryDirectory() as index_dir:
+        analyzer = new_analyzer(index_dir)
+        for ticker in args.tickers:
+            for source in args.sources:
+                print(f"recording {ticker} {source}")
+                analyzer.sources[source].lookup(ticker)
+    fixtures.data["tickers"] = args.tickers
+    fixtures.save()
+    print(f"\nSaved {sum(len(v) for k, v in fixtures.data.items() if k != 'tickers')} responses to {args.fixtures}")
+
+
+def replay(args):
+    fixtures = Fixtures(args.fixtures, upstream_delay=args.upstream_delay).load()
+    install_replayer(fixtures)
+    # fixtures don't need protecting, pacing would only measure the configured rates
+    rate_limiter.enabled = args.rate_limit
+    # replayed scrapes are not history
+    snapshot_store.enabled = False
+    tickers = args.tickers or fixtures.data["tickers"]
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        analyzer = new_analyzer(index_dir)
+
+        print_table("Source.get_ticker_info (cold)", bench_sources(analyzer, tickers, args.sources, index_dir, args.repeat))
+        print_table("gather_chatgpt_info", asyncio.run(bench_gather(analyzer, tickers, index_dir, args.repeat)))
+
+        try:
+            import app as web_app
+        except RuntimeError as e:
+            print(f"\nSkipping route benchmark: {e}")
+        else:
+            # the routes use the app's own analyzer
+            web_app.ta.sws.index = analyzer.sws.index
+            web_app.ta.tv.index = analyzer.tv.index
+            routes = asyncio.run(bench_routes(web_app.app, web_app.ta, tickers, args.sources, index_dir, args.clients, args.requests))
+            print_table(f"FastAPI routes ({args.clients} clients x {args.requests} requests)", routes)
+
+    http_pool.close()
+    ocr_pool.shutdown()
+    print_table("Peak RSS (MB)", {"rss": peak_rss_mb()})
+    if fixtures.misses:
+        print(f"\n{fixtures.misses} requests had no recorded fixture - re-record with the same tickers and sources")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record upstream responses once, then benchmark the scrapers offline against them.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--fixtures", default=tickers_constants.BENCH_FIXTURES_PATH, help="fixture file to write/read")
+    parser.add_argument("--tickers", nargs="*", default=None, help=f"tickers to record/replay (record default: {' '.join(DEFAULT_TICKERS)})")
+    parser.add_argument("--sources", nargs="*", default=list(ROUTES), choices=list(ROUTES))
+    parser.add_argument("--repeat", type=int, default=3, help="cold passes over the ticker set")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients for the route benchmark")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client for the route benchmark")
+    parser.add_argument("--upstream-delay", type=float, default=0.0,
+                        help="replay each response after this fraction of its recorded latency (0 = CPU only)")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the per-host rate limiter on during replay")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        args.tickers = args.tickers or DEFAULT_TICKERS
+        record(args)
+    else:
+        replay(args)
+
+
+if __name__ == "__main__":
+    main()
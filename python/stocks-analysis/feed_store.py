@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import tickers_constants
+
+
+def to_naive_utc(values):
+    # feeds mix naive and tz-aware timestamps, compare everything as naive UTC
+    return pd.DatetimeIndex(pd.to_datetime(values, utc=True, errors="coerce")).tz_localize(None)
+
+
+class _Feed:
+    def __init__(self):
+        self.watermark = None
+        self.items = []  # (date, record) newest first
+
+
+class FeedStore:
+    # remembers, per (ticker, feed), the newest item seen and a bounded window of recent items, so a refresh
+    # only converts the rows at or above the watermark and merges them in
+    def __init__(self, max_items: int=None, max_feeds: int=None):
+        self.max_items = max_items or tickers_constants.FEED_MAX_ITEMS
+        self.max_feeds = max_feeds or tickers_constants.FEED_MAX_FEEDS
+        self._feeds = OrderedDict()  # (ticker, feed) -> _Feed
+        self._lock = threading.Lock()
+        self._stats = {"rows_seen": 0, "rows_converted": 0}
+
+    def ingest(self, ticker: str, feed: str, rows, dates, since: pd.Timestamp, key=None, convert=None):
+        # rows is a DataFrame or a list aligned with dates; returns [(date, record)] newest first, none older than since.
+        # key(record) identifies an item among those sharing a timestamp, convert(record) only runs on new rows
+        dates = to_naive_utc(dates)
+        since = to_naive_utc([since])[0]
+        feed_key = (ticker.upper(), feed)
+        with self._lock:
+            state = self._feeds.get(feed_key)
+            watermark = state.watermark if state is not None else None
+            window = list(state.items) if state is not None else []
+
+        mask = np.asarray(dates >= since)
+        if watermark is not None:
+            # equal timestamps are re-checked against the window, anything older was already merged
+            mask &= np.asarray(dates >= watermark)
+        positions = np.flatnonzero(mask)
+
+        if isinstance(rows, pd.DataFrame):
+            records = rows.iloc[positions].to_dict(orient="records")
+        else:
+            records = [rows[i] for i in positions]
+        if convert is not None:
+            records = [convert(record) for record in records]
+
+        seen = {(date, key(record) if key else None) for date, record in window}
+        fresh = [(date, record) for date, record in zip(dates[positions], records)
+                 if (date, key(record) if key else None) not in seen]
+
+        items = sorted(fresh + [(date, record) for date, record in window if date >= since],
+                       key=lambda item: item[0], reverse=True)[:self.max_items]
+        newest = dates.max() if len(dates) else pd.NaT
+        if pd.isna(newest) or (watermark is not None and newest < watermark):
+            newest = watermark
+
+        with self._lock:
+            state = self._feeds.get(feed_key) or _Feed()
+            state.watermark = newest
+            state.items = items
+            self._feeds[feed_key] = state
+            self._feeds.move_to_end(feed_key)
+            while len(self._feeds) > self.max_feeds:
+                self._feeds.popitem(last=False)
+            self._stats["rows_seen"] += len(dates)
+            self._stats["rows_converted"] += len(positions)
+
+        return items
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, feeds=len(self._feeds))
+
+
+feed_store = FeedStore()
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+
+import tickers_constants
+from metrics import stage
+from rate_limit import rate_limiter, backoff_delay, parse_retry_after, CircuitOpenError
+
+
+class HttpPool:
+    # One event loop owns every pooled client, so sync scrapers (running in worker threads)
+    # and async callers share the same keep-alive connections and per-host limits.
+    def __init__(self, host_limits: dict=None, default_limit: int=None):
+        self.host_limits = host_limits if host_limits is not None else tickers_constants.HTTP_HOST_CONCURRENCY
+        self.default_limit = default_limit if default_limit is not None else tickers_constants.HTTP_DEFAULT_CONCURRENCY
+        self._clients = {}
+        self._semaphores = {}
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="http-pool", daemon=True).start()
+            return self._loop
+
+    def _limit(self, host):
+        return self.host_limits.get(host, self.default_limit)
+
+    def _client(self, host, proxy):
+        key = (host, proxy)
+        client = self._clients.get(key)
+        if client is None:
+            limit = self._limit(host)
+            client = httpx.AsyncClient(
+                http2=_http2_available(),
+                proxy=proxy,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit, keepalive_expiry=60),
+                timeout=tickers_constants.HTTP_TIMEOUT_SECONDS,
+            )
+            self._clients[key] = client
+        return client
+
+    def _semaphore(self, host):
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._limit(host))
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    async def _request(self, method, url, proxy=None, **kwargs):
+        host = urlsplit(url).hostname
+        attempt = 0
+        while True:
+            await rate_limiter.aacquire(host)
+            try:
+                async with self._semaphore(host):
+                    response = await self._client(host, proxy).request(method, url, **kwargs)
+            except httpx.TransportError:
+                await rate_limiter.arecord(host, error=True)
+                if attempt >= tickers_constants.HTTP_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+            else:
+                # a 429/503 pauses the host's bucket (Retry-After or backoff), so the next acquire already waits it out
+                await rate_limiter.arecord(host, response.status_code, parse_retry_after(response.headers.get("Retry-After")), attempt=attempt)
+                if response.status_code not in (429, 503) or attempt >= tickers_constants.HTTP_MAX_RETRIES:
+                    return response
+
+            attempt += 1
+
+    def _submit(self, method, url, **kwargs):
+        return asyncio.run_coroutine_threadsafe(self._request(method, url, **kwargs), self._ensure_loop())
+
+    async def aget(self, url: str, **kwargs):
+        with stage("http"):
+            return await asyncio.wrap_future(self._submit("GET", url, **kwargs))
+
+    def get(self, url: str, **kwargs):
+        with stage("http"):
+            return self._submit("GET", url, **kwargs).result()
+
+    async def _probe(self, url, **kwargs):
+        try:
+            return url, await self._request("GET", url, **kwargs)
+        except (httpx.HTTPError, CircuitOpenError):
+            return url, None
+
+    async def _find_first(self, urls, predicate, **kwargs):
+        # at most a burst's worth of probes are in flight, so a long candidate list never puts the host's
+        # bucket into debt that the requests after the winner would have to wait out
+        remaining = iter(urls)
+        window = rate_limiter.burst(urlsplit(urls[0]).hostname) if urls else 0
+        pending = set()
+
+        def launch():
+            url = next(remaining, None)
+            if url is not None:
+                pending.add(asyncio.ensure_future(self._probe(url, **kwargs)))
+
+        for _ in range(window):
+            launch()
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url, response = task.result()
+                    if response is not None and predicate(response):
+                        return url, response
+                    launch()
+            return None, None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def find_first(self, urls: list, predicate, **kwargs):
+        # probes the urls concurrently (within the per-host limit) and returns the first (url, response)
+        # whose response satisfies predicate, cancelling the remaining probes
+        with stage("http"):
+            return asyncio.run_coroutine_threadsafe(self._find_first(urls, predicate, **kwargs), self._ensure_loop()).result()
+
+    def stats(self):
+        return {
+            host: {"limit": self._limit(host), "available": semaphore._value}
+            for host, semaphore in self._semaphores.items()
+        }
+
+    def close(self):
+        if self._loop is None:
+            return
+        clients = list(self._clients.values())
+        self._clients.clear()
+
+        async def _close_all():
+            for client in clients:
+                await client.aclose()
+
+        asyncio.run_coroutine_threadsafe(_close_all(), self._loop).result()
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+http_pool = HttpPool()
@@ -0,0 +1,167 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+from PIL import Image
+
+import tickers_constants
+
+IMAGE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+FORMATS = {"png": "PNG", "webp": "WEBP", "avif": "AVIF"}
+
+
+class ImageStore:
+    # content-addressed PNG store (memory LRU in front of a directory), plus re-encoded variants
+    def __init__(self, directory: str=None, max_bytes: int=None, max_disk_bytes: int=None, max_age: int=None):
+        self.directory = directory if directory is not None else tickers_constants.IMAGE_STORE_DIR
+        self.max_bytes = max_bytes or tickers_constants.IMAGE_STORE_MAX_BYTES
+        self.max_disk_bytes = max_disk_bytes or tickers_constants.IMAGE_STORE_MAX_DISK_BYTES
+        self.max_age = max_age or tickers_constants.IMAGE_STORE_MAX_AGE_SECONDS
+        self._entries = OrderedDict()  # (image_id, format, width) -> bytes
+        self._bytes = 0
+        self._disk_bytes = 0
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._prune_disk()
+
+    def _path(self, image_id):
+        return os.path.join(self.directory, f"{image_id}.png")
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _recall(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def _touch(self, path):
+        # mtime doubles as the last use, so the disk eviction is LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _prune_disk(self):
+        # live pages hash differently on every scrape, so the directory is bounded by age and total size
+        # (every worker may prune, files another one already removed are skipped)
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".png"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+            files.sort()
+            total = sum(size for _, size, _ in files)
+            expired_before = time.time() - self.max_age
+            # down to 90% so a full store isn't rescanned on every write
+            target = self.max_disk_bytes * 0.9
+            for mtime, size, path in files:
+                if mtime >= expired_before and total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+            with self._lock:
+                self._disk_bytes = total
+                self._last_prune = time.monotonic()
+        finally:
+            self._prune_lock.release()
+
+    def put(self, png_bytes: bytes):
+        image_id = hashlib.sha256(png_bytes).hexdigest()[:32]
+        self._remember((image_id, "png", None), png_bytes)
+        if not self.directory:
+            return image_id
+
+        path = self._path(image_id)
+        if os.path.exists(path):
+            self._touch(path)
+            return image_id
+
+        # per process and thread: two render threads can store the same image at once
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(png_bytes)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._disk_bytes += len(png_bytes)
+            due = (self._disk_bytes > self.max_disk_bytes
+                   or time.monotonic() - self._last_prune >= tickers_constants.IMAGE_STORE_PRUNE_INTERVAL_SECONDS)
+        if due:
+            self._prune_disk()
+        return image_id
+
+    def put_image(self, img: Image.Image):
+        buffer = BytesIO()
+        img.save(buffer, format="PNG")
+        return self.put(buffer.getvalue())
+
+    def has(self, image_id: str, fmt: str="png"):
+        # existence only, so conditional requests are answered without reading or encoding anything
+        if not IMAGE_ID_PATTERN.match(image_id) or fmt not in FORMATS:
+            return False
+        if self._recall((image_id, "png", None)) is not None:
+            return True
+        return bool(self.directory) and os.path.exists(self._path(image_id))
+
+    def get(self, image_id: str, fmt: str="png", width: int=None):
+        if not IMAGE_ID_PATTERN.match(image_id) or fmt not in FORMATS:
+            return None
+
+        key = (image_id, fmt, width)
+        data = self._recall(key)
+        if data is not None:
+            return data
+
+        original = self._recall((image_id, "png", None))
+        if original is None and self.directory:
+            try:
+                with open(self._path(image_id), "rb") as f:
+                    original = f.read()
+            except OSError:
+                return None
+            self._touch(self._path(image_id))
+            self._remember((image_id, "png", None), original)
+        if original is None:
+            return None
+        if fmt == "png" and not width:
+            return original
+
+        img = Image.open(BytesIO(original))
+        if width and width < img.width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        buffer = BytesIO()
+        img.save(buffer, format=FORMATS[fmt], quality=tickers_constants.IMAGE_VARIANT_QUALITY)
+        data = buffer.getvalue()
+        self._remember(key, data)
+        return data
+
+
+image_store = ImageStore()
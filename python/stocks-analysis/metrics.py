@@ -0,0 +1,189 @@
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+
+import tickers_constants
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    REGISTRY = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# the source whose lookup is running in this thread/task, so shared pools can attribute their stage timings
+current_source = contextvars.ContextVar("current_source", default="none")
+
+
+class _NoopMetric:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+
+if REGISTRY is None:
+    Counter = Gauge = Histogram = _NoopMetric
+
+SOURCE_SECONDS = Histogram(
+    "stocks_source_seconds", "Wall time of a full source scrape",
+    ["source", "outcome"], buckets=tickers_constants.METRICS_SOURCE_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "stocks_stage_seconds", "Wall time spent per stage (http, render, ocr, pandas, normalize, snapshot, encode)",
+    ["source", "stage"], buckets=tickers_constants.METRICS_STAGE_BUCKETS,
+)
+# livesum adds up the live workers when PROMETHEUS_MULTIPROC_DIR is set
+SOURCE_IN_FLIGHT = Gauge("stocks_source_in_flight", "Source scrapes currently running", ["source"], multiprocess_mode="livesum")
+REQUESTS_IN_FLIGHT = Gauge("stocks_requests_in_flight", "HTTP requests currently being served by the app", multiprocess_mode="livesum")
+UPSTREAM_RESPONSES = Counter(
+    "stocks_upstream_responses_total", "Upstream responses by host and status code ('error' for transport failures)",
+    ["host", "status"],
+)
+
+
+class _SourceTimer:
+    outcome = "exception"
+
+
+@contextmanager
+def source_timer(source: str):
+    # times one scrape and tags everything it does (in this context) with the source; set timer.outcome on success
+    token = current_source.set(source)
+    timer = _SourceTimer()
+    SOURCE_IN_FLIGHT.labels(source).inc()
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        SOURCE_SECONDS.labels(source, timer.outcome).observe(time.perf_counter() - start)
+        SOURCE_IN_FLIGHT.labels(source).dec()
+        current_source.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(current_source.get(), name).observe(time.perf_counter() - start)
+
+
+def propagate(fn):
+    # thread pools don't carry context variables over, wrap the callable so its stages keep the caller's source
+    source = current_source.get()
+
+    def run(*args, **kwargs):
+        token = current_source.set(source)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            current_source.reset(token)
+
+    return run
+
+
+class InFlightMiddleware:
+    # plain ASGI rather than BaseHTTPMiddleware, whose call_next returns once the headers are out, so
+    # streamed responses (NDJSON, SSE) are counted until their last body chunk or the client leaving
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        REQUESTS_IN_FLIGHT.inc()
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if not finished:
+                finished = True
+                REQUESTS_IN_FLIGHT.dec()
+
+        async def tracked_send(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        async def tracked_receive():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                finish()
+            return message
+
+        try:
+            await self.app(scope, tracked_receive, tracked_send)
+        finally:
+            finish()
+
+
+class StatsCollector:
+    # exported at scrape time from the stats the caches and pools already keep, so the hot paths pay nothing extra
+    def __init__(self, analyzer, render_pool, ocr_pool):
+        self.analyzer = analyzer
+        self.render_pool = render_pool
+        self.ocr_pool = ocr_pool
+
+    def collect(self):
+        cache = self.analyzer.cache_stats()
+        lookups = CounterMetricFamily("stocks_cache_lookups", "Source cache lookups by result", labels=["source", "result"])
+        hit_ratio = GaugeMetricFamily("stocks_cache_hit_ratio", "Source cache hit ratio (memory and disk)", labels=["source"])
+        for source, stats in cache["sources"].items():
+            for result in ("hits", "disk_hits", "misses"):
+                lookups.add_metric([source, result], stats[result])
+            if stats["hit_ratio"] is not None:
+                hit_ratio.add_metric([source], stats["hit_ratio"])
+        yield lookups
+        yield hit_ratio
+        yield GaugeMetricFamily("stocks_cache_bytes", "Bytes held by the in-memory source cache", value=cache["bytes"])
+        yield GaugeMetricFamily("stocks_coalesced_in_flight", "Distinct lookups currently being led by single-flight",
+                                value=cache["in_flight"]["in_flight"])
+
+        render = self.render_pool.stats()
+        yield GaugeMetricFamily("stocks_render_queue_depth", "Page renders waiting for a worker", value=render["queue_depth"])
+        yield GaugeMetricFamily("stocks_render_busy_workers", "Render workers currently loading a page", value=render["busy"])
+        yield GaugeMetricFamily("stocks_render_workers", "Render pool size", value=render["workers"])
+
+        ocr = self.ocr_pool.stats()
+        ocr_lookups = CounterMetricFamily("stocks_ocr_cache_lookups", "OCR result cache lookups by result", labels=["result"])
+        ocr_lookups.add_metric(["hits"], ocr["hits"])
+        ocr_lookups.add_metric(["misses"], ocr["misses"])
+        yield ocr_lookups
+
+
+_stats_collectors = []
+
+
+def register_stats(analyzer, render_pool, ocr_pool):
+    if REGISTRY is not None:
+        collector = StatsCollector(analyzer, render_pool, ocr_pool)
+        _stats_collectors.append(collector)
+        REGISTRY.register(collector)
+
+
+def render_latest():
+    if REGISTRY is None:
+        return b"# prometheus_client is not installed\n"
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # every worker writes its samples to the shared directory, so any of them can serve the merged view
+        # (cache and pool stats are still the serving worker's own)
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _stats_collectors:
+            registry.register(collector)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
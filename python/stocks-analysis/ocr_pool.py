@@ -0,0 +1,113 @@
+import os
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+import tickers_constants
+from metrics import stage
+
+pytesseract.pytesseract.tesseract_cmd = tickers_constants.TESSERACT_PATH
+
+SHARPEN_KERNEL = np.array([[-2, -2, -2], [-2, 32, -2], [-2, -2, -2]], dtype=np.float32) / 16
+
+
+def _sharpen(gray: np.ndarray):
+    padded = np.pad(gray, 1, mode="edge")
+    h, w = gray.shape
+    out = np.zeros_like(gray)
+    for dy in range(3):
+        for dx in range(3):
+            out += SHARPEN_KERNEL[dy, dx] * padded[dy:dy + h, dx:dx + w]
+    return np.clip(out, 0, 255)
+
+
+def preprocess_for_text(img: Image.Image):
+    # grayscale -> sharpen -> contrast x2 -> invert -> binarize -> 2x upscale, as numpy array ops
+    rgb = np.asarray(img.convert("RGB"), dtype=np.float32)
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    sharpened = _sharpen(gray)
+    contrast = np.clip(sharpened.mean() + 2.0 * (sharpened - sharpened.mean()), 0, 255)
+    inverted = 255 - contrast
+    binarized = np.where(inverted > 128, 255, 0).astype(np.uint8)
+    upscaled = binarized.repeat(2, axis=0).repeat(2, axis=1)
+    return Image.fromarray(upscaled)
+
+
+PREPROCESSORS = {
+    None: None,
+    "text": preprocess_for_text,
+}
+
+
+def _ocr(mode: str, size: tuple, raw: bytes, preprocess: str):
+    img = Image.frombytes(mode, size, raw)
+    if PREPROCESSORS[preprocess] is not None:
+        img = PREPROCESSORS[preprocess](img)
+    try:
+        return pytesseract.image_to_string(img)
+    except Exception as e:
+        # some pytesseract errors can't be unpickled in the parent, which would break the whole pool
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+class OcrPool:
+    def __init__(self, workers: int=None, cache_entries: int=None):
+        # STOCKS_OCR_WORKERS lets run_workers.sh split the cores between the worker processes
+        self.workers = workers or int(os.environ.get("STOCKS_OCR_WORKERS") or 0) or tickers_constants.OCR_WORKERS or os.cpu_count()
+        self.cache_entries = cache_entries or tickers_constants.OCR_CACHE_ENTRIES
+        self._executor = None
+        self._cache = OrderedDict()  # content hash -> text
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # never fork: this process already runs the http loop, browser and scrape threads, and a child
+                # forked while one of them holds a lock can deadlock
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+            return self._executor
+
+    def image_to_string(self, img: Image.Image, preprocess: str=None):
+        raw = img.tobytes()
+        key = hashlib.blake2b(raw + f"{img.mode}{img.size}{preprocess}".encode(), digest_size=16).hexdigest()
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._cache[key]
+            self._stats["misses"] += 1
+
+        with stage("ocr"):
+            text = self._pool().submit(_ocr, img.mode, img.size, raw, preprocess).result()
+
+        with self._lock:
+            self._cache[key] = text
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return text
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, workers=self.workers, cached=len(self._cache))
+
+
+ocr_pool = OcrPool()
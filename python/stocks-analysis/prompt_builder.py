@@ -0,0 +1,146 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+import tickers_constants
+from serialization import dumps, dumps_bytes
+from source_cache import is_error_result
+
+IMAGE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+BASE64_PATTERN = re.compile(r"^[A-Za-z0-9+/=\s]{200,}$")
+
+
+def estimate_tokens(text: str):
+    return len(text) // tickers_constants.PROMPT_CHARS_PER_TOKEN + 1
+
+
+def fingerprint(ticker: str, sources: dict):
+    # identifies the exact inputs of an analysis, so any change in any source summary gives a new prompt
+    return hashlib.blake2b(dumps_bytes([ticker.upper(), sources]), digest_size=16).hexdigest()
+
+
+def _is_noise(key, value):
+    if isinstance(key, str) and key.lower() in tickers_constants.PROMPT_DROP_FIELDS:
+        return True
+    if isinstance(value, str):
+        return (value.startswith(("http://", "https://", "/img/", "data:"))
+                or IMAGE_ID_PATTERN.match(value) is not None
+                or BASE64_PATTERN.match(value) is not None)
+    return False
+
+
+def compact(value, max_items: int=None):
+    # strips images, base64 and links, keeps the first rows of every table and shortens long text
+    max_items = max_items or tickers_constants.PROMPT_MAX_ITEMS
+    if isinstance(value, dict):
+        kept = [(k, v) for k, v in value.items() if not _is_noise(k, v)]
+        if _is_table(kept):
+            kept = kept[:max_items]
+        return {k: compact(v, max_items) for k, v in kept}
+    elif isinstance(value, (list, tuple)):
+        return [compact(v, max_items) for v in value[:max_items] if not _is_noise(None, v)]
+    elif isinstance(value, str):
+        limit = tickers_constants.PROMPT_MAX_STRING_CHARS
+        return value if len(value) <= limit else value[:limit].rstrip() + "…"
+    elif isinstance(value, float):
+        return round(value, 2)
+    return value
+
+
+def _is_table(items):
+    # date/row keyed dicts (news, ratings, insiders, discussions) hold one nested record per key
+    return len(items) > tickers_constants.PROMPT_MAX_ITEMS and all(isinstance(v, dict) for _, v in items)
+
+
+def _has_rows(value):
+    return value not in (None, "", {}, [])
+
+
+def _ranked_fields(source: str, data: dict):
+    priority = tickers_constants.PROMPT_FIELD_PRIORITY.get(source, [])
+    rank = {field: i for i, field in enumerate(priority)}
+    return sorted(data.items(), key=lambda item: rank.get(item[0], len(priority)))
+
+
+def format_source(source: str, data, budget: int):
+    header = f"## {source}\n"
+    if not isinstance(data, dict) or is_error_result(data):
+        return header + "No data available.\n"
+
+    lines, used = [], estimate_tokens(header)
+    for key, value in _ranked_fields(source, data):
+        if _is_noise(key, value):
+            continue
+        value = compact(value)
+        if not _has_rows(value):
+            continue
+
+        line = f"- {key}: {value if isinstance(value, str) else dumps(value)}\n"
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            # the highest ranked field that doesn't fit is cut down to what is left, the rest are dropped
+            remaining_chars = (budget - used) * tickers_constants.PROMPT_CHARS_PER_TOKEN
+            if remaining_chars >= tickers_constants.PROMPT_MIN_FIELD_CHARS:
+                lines.append(line[:remaining_chars].rstrip() + "…\n")
+            break
+        lines.append(line)
+        used += cost
+
+    return header + ("".join(lines) or "No data available.\n")
+
+
+class PromptBuilder:
+    TEMPLATE = (
+        "You are a professional financial analyst. Analyze the stock {ticker} using the following data "
+        "from {count} sources (truncated to the most relevant fields):\n\n{sections}\n"
+        "Please provide:\n"
+        "1. A concise summary of the stock's financial and technical status.\n"
+        "2. Key strengths and weaknesses found in the data.\n"
+        "3. A clear investment recommendation (e.g., Strong Buy, Buy, Hold, Sell, Strong Sell).\n"
+        "4. A one-sentence justification for your recommendation.\n"
+        "Make sure you keep you answer for each clause up to 5 lines.\n"
+        "Remember to mention in capital letters that what you provide is not a financial advice before you analysis.\n"
+    )
+
+    def __init__(self, token_budget: int=None, cache_entries: int=None):
+        self.token_budget = token_budget or tickers_constants.PROMPT_TOKEN_BUDGET
+        self.cache_entries = cache_entries or tickers_constants.PROMPT_CACHE_ENTRIES
+        self._cache = OrderedDict()  # (ticker, fingerprint) -> prompt
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _compile(self, ticker: str, sources: dict):
+        # small sources hand their unused share of the budget on to the bigger ones
+        sizes = {name: estimate_tokens(dumps(data)) for name, data in sources.items()}
+        sections = {}
+        remaining = self.token_budget
+        for i, name in enumerate(sorted(sources, key=sizes.get)):
+            share = remaining // (len(sources) - i)
+            sections[name] = format_source(name, sources[name], share)
+            remaining -= min(share, estimate_tokens(sections[name]))
+
+        return self.TEMPLATE.format(ticker=ticker.upper(), count=len(sources),
+                                    sections="\n".join(sections[name] for name in sources))
+
+    def build(self, ticker: str, sources: dict):
+        # returns (prompt, fingerprint); the compiled prompt is reused while every source summary is unchanged
+        key = (ticker.upper(), fingerprint(ticker, sources))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._cache[key], key[1]
+            self._stats["misses"] += 1
+
+        prompt = self._compile(ticker, sources)
+
+        with self._lock:
+            self._cache[key] = prompt
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return prompt, key[1]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, cached=len(self._cache), token_budget=self.token_budget)
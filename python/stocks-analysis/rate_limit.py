@@ -0,0 +1,190 @@
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import tickers_constants
+from metrics import UPSTREAM_RESPONSES
+from shared_store import shared_store
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Too many failed requests to {host}, paused for another {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def backoff_delay(attempt: int, base: float=None, cap: float=None):
+    # exponential backoff with "equal jitter": half fixed, half random
+    base = base or tickers_constants.BACKOFF_BASE_SECONDS
+    cap = cap or tickers_constants.BACKOFF_CAP_SECONDS
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostState:
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self.blocked_until = 0.0
+        self.open_until = 0.0
+        self.failures = 0
+        self.throttled = 0
+        self.errors = 0
+        self.requests = 0
+
+
+class RateLimiter:
+    # token bucket per upstream host that halves its rate on 429/503 (honouring Retry-After) and creeps back up
+    # on success (AIMD), plus a circuit breaker that stops calling a host after repeated failures.
+    # With a shared store the buckets live there, so every worker process draws from the same budget.
+    def __init__(self, limits: dict=None, store=None):
+        self.limits = limits if limits is not None else tickers_constants.RATE_LIMITS
+        self.store = store
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self.enabled = True
+
+    def _new_state(self, host):
+        rate, burst = self.limits.get(host, tickers_constants.RATE_LIMIT_DEFAULT)
+        return _HostState(rate, burst)
+
+    @contextmanager
+    def _state(self, host):
+        if self.store is None:
+            with self._lock:
+                state = self._hosts.get(host)
+                if state is None:
+                    state = self._hosts[host] = self._new_state(host)
+                yield state
+            return
+
+        with self.store.locked_state(f"rate:{host}") as holder:
+            if holder["value"] is None:
+                holder["value"] = self._new_state(host)
+            yield holder["value"]
+
+    def _reserve(self, host):
+        # takes a token (possibly going into debt) and returns how long the caller must wait before using it
+        if not self.enabled:
+            return 0.0
+        now = time.time()
+        with self._state(host) as state:
+            if state.open_until > now:
+                raise CircuitOpenError(host, state.open_until - now)
+
+            state.tokens = min(state.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+            state.tokens -= 1
+            state.requests += 1
+            wait = -state.tokens / state.rate if state.tokens < 0 else 0.0
+            return max(wait, state.blocked_until - now)
+
+    def refund(self, host: str):
+        # gives back a token that was reserved but never used (the caller was cancelled before sending)
+        if not self.enabled:
+            return
+        with self._state(host) as state:
+            state.tokens = min(state.burst, state.tokens + 1)
+            state.requests -= 1
+
+    def burst(self, host: str):
+        return self.limits.get(host, tickers_constants.RATE_LIMIT_DEFAULT)[1]
+
+    def acquire(self, host: str):
+        wait = self._reserve(host)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, host: str):
+        # with a shared store every reserve is a SQLite write transaction, keep it off the event loop
+        wait = await asyncio.to_thread(self._reserve, host) if self.store is not None else self._reserve(host)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # a cancelled waiter (e.g. a losing find_first probe) must not leave the host in debt
+                if self.store is not None:
+                    asyncio.get_running_loop().run_in_executor(None, self.refund, host)
+                else:
+                    self.refund(host)
+                raise
+
+    def record(self, host: str, status: int=None, retry_after: float=None, error: bool=False, attempt: int=0):
+        UPSTREAM_RESPONSES.labels(host, "error" if error or status is None else str(status)).inc()
+        now = time.time()
+        with self._state(host) as state:
+            if status in (429, 503):
+                state.throttled += 1
+                state.failures += 1
+                state.rate = max(tickers_constants.RATE_LIMIT_MIN_RATE, state.rate / 2)
+                pause = retry_after if retry_after is not None else backoff_delay(attempt)
+                state.blocked_until = max(state.blocked_until, now + pause)
+            elif error or (status is not None and status >= 500):
+                state.errors += 1
+                state.failures += 1
+            else:
+                state.failures = 0
+                state.open_until = 0.0
+                state.rate = min(state.max_rate, state.rate + state.max_rate * tickers_constants.RATE_LIMIT_RECOVERY)
+
+            if state.failures >= tickers_constants.CIRCUIT_FAILURE_THRESHOLD:
+                state.open_until = now + tickers_constants.CIRCUIT_COOLDOWN_SECONDS
+                state.failures = tickers_constants.CIRCUIT_FAILURE_THRESHOLD - 1  # one more failure after cooldown re-opens it
+
+    async def arecord(self, host: str, status: int=None, retry_after: float=None, error: bool=False, attempt: int=0):
+        if self.store is not None:
+            await asyncio.to_thread(self.record, host, status, retry_after, error, attempt)
+        else:
+            self.record(host, status, retry_after, error, attempt)
+
+    def stats(self):
+        now = time.time()
+        if self.store is not None:
+            states = self.store.states("rate:")
+        else:
+            with self._lock:
+                states = dict(self._hosts)
+
+        hosts = {}
+        for host, state in states.items():
+            if state.open_until > now:
+                circuit = "open"
+            elif state.failures > 0:
+                circuit = "half-open" if state.open_until else "degraded"
+            else:
+                circuit = "closed"
+            hosts[host] = {
+                "circuit": circuit,
+                "rate_per_s": round(state.rate, 3),
+                "max_rate_per_s": state.max_rate,
+                "blocked_for_s": round(max(0.0, state.blocked_until - now), 1),
+                "reopens_in_s": round(max(0.0, state.open_until - now), 1),
+                "requests": state.requests,
+                "throttled": state.throttled,
+                "errors": state.errors,
+            }
+        return hosts
+
+
+rate_limiter = RateLimiter(store=shared_store)
@@ -0,0 +1,210 @@
+import os
+import time
+import queue
+import threading
+from io import BytesIO
+from collections import deque, OrderedDict
+from urllib.parse import urlsplit
+from concurrent.futures import Future
+
+import imgkit
+from PIL import Image
+
+import tickers_constants
+from single_flight import SingleFlight
+from rate_limit import rate_limiter
+from metrics import stage
+
+
+class PlaywrightRenderer:
+    # one warm headless Chromium per worker thread, pages wait for a selector or network idle
+    def __init__(self):
+        from playwright.sync_api import sync_playwright
+        self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=True)
+        self._context = self._browser.new_context(viewport={"width": tickers_constants.RENDER_WIDTH, "height": 1080})
+
+    def render(self, url: str, wait_for: str=None, timeout: int=None):
+        timeout = timeout or tickers_constants.RENDER_TIMEOUT_MS
+        page = self._context.new_page()
+        try:
+            page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+            try:
+                if wait_for:
+                    page.wait_for_selector(wait_for, timeout=timeout)
+                else:
+                    # ad-heavy and polling pages rarely go idle, so this is capped well below the old fixed delay
+                    page.wait_for_load_state("networkidle", timeout=min(timeout, tickers_constants.RENDER_IDLE_TIMEOUT_MS))
+            except Exception:
+                pass  # screenshot whatever has rendered by then
+            return page.screenshot(full_page=True, type="png")
+        finally:
+            page.close()
+
+    def close(self):
+        try:
+            self._browser.close()
+            self._playwright.stop()
+        except Exception:
+            pass
+
+
+class WkhtmltoimageRenderer:
+    # fallback when playwright isn't installed - no DOM events, so keep the fixed JS delay
+    def __init__(self):
+        self._config = imgkit.config(wkhtmltoimage=tickers_constants.WKHTMLTOIMAGE_PATH)
+
+    def render(self, url: str, wait_for: str=None, timeout: int=None):
+        options = {
+            "javascript-delay": str(tickers_constants.RENDER_FALLBACK_DELAY_MS),
+            "load-error-handling": "ignore",
+            "no-stop-slow-scripts": "",
+            "enable-javascript": "",
+            "width": str(tickers_constants.RENDER_WIDTH),
+        }
+        return imgkit.from_url(url, False, config=self._config, options=options)
+
+    def close(self):
+        pass
+
+
+def _new_renderer():
+    try:
+        return PlaywrightRenderer()
+    except Exception as e:
+        print(f"Playwright unavailable ({e}), falling back to wkhtmltoimage")
+        return WkhtmltoimageRenderer()
+
+
+class RenderPool:
+    def __init__(self, size: int=None, renderer_factory=_new_renderer):
+        self.size = size or int(os.environ.get("STOCKS_RENDER_POOL_SIZE") or 0) or tickers_constants.RENDER_POOL_SIZE
+        self._renderer_factory = renderer_factory
+        self._jobs = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._completed = 0
+        self._failed = 0
+        self._latencies = deque(maxlen=200)
+        self._pages = OrderedDict()  # (url, wait_for) -> (expires_at, png bytes)
+        self._page_hits = 0
+        self._page_loads = SingleFlight()
+
+    def _ensure_workers(self):
+        with self._lock:
+            while len(self._workers) < self.size:
+                worker = threading.Thread(target=self._work, name=f"render-{len(self._workers)}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        renderer = None
+        while True:
+            future, url, wait_for, timeout = self._jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with self._lock:
+                self._busy += 1
+            start = time.perf_counter()
+            try:
+                if renderer is None:
+                    renderer = self._renderer_factory()
+                future.set_result(renderer.render(url, wait_for, timeout))
+                ok = True
+            except Exception as e:
+                future.set_exception(e)
+                ok = False
+                # a crashed browser is replaced on the next job
+                if renderer is not None:
+                    renderer.close()
+                renderer = None
+
+            with self._lock:
+                self._busy -= 1
+                self._latencies.append(time.perf_counter() - start)
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    def submit(self, url: str, wait_for: str=None, timeout: int=None):
+        self._ensure_workers()
+        future = Future()
+        self._jobs.put((future, url, wait_for, timeout))
+        return future
+
+    def _cached_page(self, key):
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._pages[key]
+                return None
+            self._pages.move_to_end(key)
+            self._page_hits += 1
+            return entry[1]
+
+    def _load_page(self, url, wait_for, timeout):
+        key = (url, wait_for)
+        img_bytes = self._cached_page(key)
+        if img_bytes is not None:
+            return img_bytes
+
+        host = urlsplit(url).hostname
+        rate_limiter.acquire(host)
+        try:
+            img_bytes = self.submit(url, wait_for, timeout).result()
+        except Exception:
+            rate_limiter.record(host, error=True)
+            raise
+        rate_limiter.record(host, 200)
+
+        with self._lock:
+            self._pages[key] = (time.monotonic() + tickers_constants.RENDER_PAGE_CACHE_SECONDS, img_bytes)
+            while len(self._pages) > tickers_constants.RENDER_PAGE_CACHE_ENTRIES:
+                self._pages.popitem(last=False)
+        return img_bytes
+
+    def render(self, url: str, wait_for: str=None, timeout: int=None):
+        # full-page PNG bytes, one page load shared by concurrent callers and reused for a short while
+        with stage("render"):
+            img_bytes = self._cached_page((url, wait_for))
+            if img_bytes is not None:
+                return img_bytes
+            return self._page_loads.do((url, wait_for), self._load_page, url, wait_for, timeout)
+
+    def render_regions(self, url: str, regions: dict, wait_for: str=None, timeout: int=None):
+        # loads the page once and returns the full image plus every named crop box
+        full_image = Image.open(BytesIO(self.render(url, wait_for, timeout)))
+        return full_image, {name: full_image.crop(box) for name, box in regions.items()}
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            busy, completed, failed = self._busy, self._completed, self._failed
+            cached_pages, page_hits = len(self._pages), self._page_hits
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else None
+
+        return {
+            "workers": self.size,
+            "busy": busy,
+            "queue_depth": self._jobs.qsize(),
+            "completed": completed,
+            "failed": failed,
+            "cached_pages": cached_pages,
+            "page_cache_hits": page_hits,
+            "latency_p50_s": percentile(0.5),
+            "latency_p95_s": percentile(0.95),
+        }
+
+
+render_pool = RenderPool()
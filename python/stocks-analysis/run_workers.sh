@@ -0,0 +1,14 @@
+# one process per core by default; caches, scrape coalescing and rate limits are shared through .ticker_cache.db
+export STOCKS_WORKERS=${STOCKS_WORKERS:-$(nproc)}
+
+# every worker has its own OCR processes, browsers and scrape threads, split the single-process sizes
+# (one OCR process per core, RENDER_POOL_SIZE=3, SCRAPE_THREADS=16) between the workers
+per_worker() { echo $(( $1 / STOCKS_WORKERS > 0 ? $1 / STOCKS_WORKERS : 1 )); }
+export STOCKS_OCR_WORKERS=${STOCKS_OCR_WORKERS:-$(per_worker "$(nproc)")}
+export STOCKS_RENDER_POOL_SIZE=${STOCKS_RENDER_POOL_SIZE:-$(per_worker 3)}
+export STOCKS_SCRAPE_THREADS=${STOCKS_SCRAPE_THREADS:-$(per_worker 16)}
+
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/stocks-analysis-metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+uvicorn app:app --workers "$STOCKS_WORKERS" --host 0.0.0.0 --port 3000
@@ -0,0 +1,53 @@
+import json
+import math
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from metrics import stage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def normalize(obj):
+    # one pass to plain JSON types: str keys, ISO dates, NaN/inf -> None, numpy scalars -> python
+    if isinstance(obj, dict):
+        return {k if isinstance(k, str) else str(k): normalize(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple, set)):
+        return [normalize(v) for v in obj]
+    elif isinstance(obj, str) or obj is None or isinstance(obj, bool):
+        return obj
+    elif isinstance(obj, np.generic):
+        # ahead of float: np.float64 subclasses it and orjson would encode it as a string
+        return normalize(obj.item())
+    elif isinstance(obj, float):
+        return None if math.isnan(obj) or math.isinf(obj) else obj
+    elif isinstance(obj, int):
+        return obj
+    elif obj is pd.NaT:
+        return None
+    elif isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    elif isinstance(obj, (pd.Series, pd.DataFrame)):
+        return normalize(obj.to_dict())
+    return obj
+
+
+def dumps(obj) -> str:
+    # values are normalized before they reach here, default=str only guards stragglers
+    with stage("encode"):
+        if orjson is not None:
+            return orjson.dumps(obj, default=str).decode()
+        return json.dumps(obj, default=str)
+
+
+def dumps_bytes(obj) -> bytes:
+    # for response bodies, orjson already produces UTF-8 bytes so skip the str round trip
+    with stage("encode"):
+        if orjson is not None:
+            return orjson.dumps(obj, default=str)
+        return json.dumps(obj, default=str).encode("utf-8")
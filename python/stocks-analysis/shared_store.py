@@ -0,0 +1,85 @@
+import os
+import time
+import uuid
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import tickers_constants
+
+
+class SharedStore:
+    # cross-worker coordination on the disk cache's SQLite file: leases (single-flight and leader election
+    # between processes) and small pickled state rows (rate limiter buckets), all under SQLite's write lock
+    def __init__(self, path: str):
+        self.path = path
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        with self.transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def lease(self, key: str, ttl: float):
+        # takes or renews the lease on key; False while another worker holds one that hasn't expired
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] != self.owner and row[1] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)", (key, self.owner, now + ttl))
+            return True
+
+    def release(self, key: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    @contextmanager
+    def locked_state(self, key: str):
+        # read-modify-write of one state row; the caller replaces holder["value"] or mutates it in place
+        with self.transaction() as conn:
+            row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+            holder = {"value": pickle.loads(row[0]) if row is not None else None}
+            yield holder
+            conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                         (key, pickle.dumps(holder["value"], protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def states(self, prefix: str):
+        rows = self._conn().execute("SELECT key, value FROM state WHERE key LIKE ?", (f"{prefix}%",)).fetchall()
+        return {key[len(prefix):]: pickle.loads(value) for key, value in rows}
+
+
+def default_shared_store():
+    # only worth its SQLite writes when several workers are running (run_workers.sh sets STOCKS_WORKERS),
+    # it lives next to the disk cache and no disk cache means single-process state
+    path = os.environ.get("STOCKS_CACHE_DB", tickers_constants.CACHE_DB_PATH)
+    if not path or int(os.environ.get("STOCKS_WORKERS") or 1) <= 1:
+        return None
+    try:
+        return SharedStore(path)
+    except Exception as e:
+        print(f"Shared state disabled: {e}")
+        return None
+
+
+shared_store = default_shared_store()
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    # concurrent callers for the same key share one in-flight call instead of each starting their own
+    def __init__(self, executor=None):
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"calls": 0, "shared": 0}
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats["shared"] += 1
+                return future, False
+
+            future = Future()
+            self._calls[key] = future
+            self._stats["calls"] += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def _lead(self, key, future, fn, args):
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self._finish(key, future, error=e)
+            return
+        self._finish(key, future, result)
+
+    def do(self, key, fn, *args):
+        future, leader = self._join(key)
+        if leader:
+            self._lead(key, future, fn, args)
+        return future.result()
+
+    async def ado(self, key, fn, *args):
+        # same as do() for async callers, fn is a blocking callable run off the event loop
+        future, leader = self._join(key)
+        if leader:
+            asyncio.get_running_loop().run_in_executor(self.executor, self._lead, key, future, fn, args)
+        # shielded so a cancelled caller (e.g. a closed SSE stream) never cancels the call under the other waiters
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def in_flight(self):
+        with self._lock:
+            return list(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+
+
+class _Broadcast:
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+
+    async def publish(self, chunk):
+        async with self.changed:
+            self.chunks.append(chunk)
+            self.changed.notify_all()
+
+    async def close(self, error=None):
+        async with self.changed:
+            self.done = True
+            self.error = error
+            self.changed.notify_all()
+
+    async def subscribe(self):
+        # late subscribers first catch up on everything already generated
+        index = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: index < len(self.chunks) or self.done)
+                chunks = self.chunks[index:]
+                done, error = self.done, self.error
+
+            for chunk in chunks:
+                yield chunk
+            index += len(chunks)
+
+            if done and index >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class SharedStream:
+    # single-flight for streams: concurrent subscribers of the same key share one upstream generator
+    # (a blocking iterator run off the event loop) and each receive every chunk from the start
+    def __init__(self):
+        self._live = {}
+        self._tasks = set()
+        self._stats = {"streams": 0, "shared": 0}
+
+    async def _pump(self, key, broadcast, iterator):
+        loop = asyncio.get_running_loop()
+        done = object()
+        try:
+            while (chunk := await loop.run_in_executor(None, next, iterator, done)) is not done:
+                await broadcast.publish(chunk)
+        except Exception as e:
+            await broadcast.close(e)
+        else:
+            await broadcast.close()
+        finally:
+            self._live.pop(key, None)
+
+    def subscribe(self, key, start):
+        # start() returns the blocking iterator, it is only called when no stream for key is running; the
+        # generation runs to completion even if every subscriber leaves
+        broadcast = self._live.get(key)
+        if broadcast is None:
+            broadcast = self._live[key] = _Broadcast()
+            self._stats["streams"] += 1
+            task = asyncio.create_task(self._pump(key, broadcast, start()))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self._stats["shared"] += 1
+        return broadcast.subscribe()
+
+    def stats(self):
+        return dict(self._stats, live=len(self._live))
@@ -0,0 +1,237 @@
+import os
+import re
+import time
+import uuid
+import operator
+import functools
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import tickers_constants
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+NUMBER_PATTERN = re.compile(r"[$€£]?\s*([-+]?\d[\d,]*(?:\.\d+)?)\s*([KMBT])?\s*(%|x)?(?:\s*\(.*\))?", re.IGNORECASE)
+MULTIPLIERS = {"K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}
+IMAGE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+if pa is not None:
+    SCHEMA = pa.schema([
+        ("scraped_at", pa.timestamp("us", tz="UTC")),
+        ("source", pa.string()),
+        ("metric", pa.string()),
+        ("value", pa.float64()),
+        ("text", pa.string()),
+    ])
+    PARTITION_SCHEMA = pa.schema([("date", pa.string()), ("ticker", pa.string())])
+    PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+    # explicit, so an empty or freshly created directory still has every column
+    DATASET_SCHEMA = pa.unify_schemas([SCHEMA, PARTITION_SCHEMA])
+
+
+def parse_number(value):
+    # "1.2B" -> 1.2e9, "12.5%" -> 12.5, "$150.2" -> 150.2, "3 (Hold)" -> 3; None when it isn't a number
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = NUMBER_PATTERN.fullmatch(value.strip())
+    if match is None:
+        return None
+    number = float(match.group(1).replace(",", ""))
+    return number * MULTIPLIERS.get((match.group(2) or "").upper(), 1)
+
+
+def _is_noise(key, value):
+    if key.lower() in tickers_constants.SNAPSHOT_SKIP_FIELDS:
+        return True
+    return isinstance(value, str) and (value.startswith(("http://", "https://", "/img/", "data:"))
+                                       or IMAGE_ID_PATTERN.match(value) is not None)
+
+
+def flatten(summary: dict, prefix: str="", depth: int=0):
+    # nested summaries become dotted metric names ("Key stats.Market capitalization", "Price target.0"),
+    # only scalar leaves are kept and feeds (news, ratings, discussions) are left to the live sources
+    for key, value in summary.items():
+        if _is_noise(key, value):
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, (list, tuple)):
+            value = {str(i): v for i, v in enumerate(value)}
+        if isinstance(value, dict):
+            if depth + 1 < tickers_constants.SNAPSHOT_MAX_DEPTH and len(value) <= tickers_constants.SNAPSHOT_MAX_FIELDS:
+                yield from flatten(value, f"{name}.", depth + 1)
+        elif value is not None:
+            text = value if isinstance(value, str) else None
+            if text is None or len(text) <= tickers_constants.SNAPSHOT_MAX_TEXT_CHARS:
+                yield name, parse_number(value), text
+
+
+class SnapshotStore:
+    # every fresh scrape is appended as (metric, value) rows to Parquet files partitioned by date and ticker,
+    # so trends and screens are answered from local data. Rows are buffered and written in batches, each
+    # worker writes its own files so several processes can share the directory
+    def __init__(self, path: str, flush_rows: int=None, flush_seconds: float=None):
+        self.path = path
+        self.enabled = pa is not None and bool(path)
+        self.flush_rows = flush_rows or tickers_constants.SNAPSHOT_FLUSH_ROWS
+        self.flush_seconds = flush_seconds or tickers_constants.SNAPSHOT_FLUSH_SECONDS
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._buffer = []  # (date, ticker, row)
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stats = {"snapshots": 0, "rows": 0, "files": 0}
+
+    def append(self, source: str, ticker: str, summary: dict, scraped_at: datetime=None):
+        if not self.enabled or not isinstance(summary, dict):
+            return
+        scraped_at = scraped_at or datetime.now(timezone.utc)
+        date, ticker = scraped_at.strftime("%Y-%m-%d"), ticker.upper()
+        rows = [(date, ticker, {"scraped_at": scraped_at, "source": source, "metric": metric, "value": value, "text": text})
+                for metric, value, text in flatten(summary)]
+
+        with self._lock:
+            self._buffer.extend(rows)
+            self._stats["snapshots"] += 1
+            due = len(self._buffer) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        if not self.enabled:
+            return
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+                self._last_flush = time.monotonic()
+            if not rows:
+                return
+
+            partitions = {}
+            for date, ticker, row in rows:
+                partitions.setdefault((date, ticker), []).append(row)
+            for (date, ticker), part in partitions.items():
+                directory = os.path.join(self.path, f"date={date}", f"ticker={ticker}")
+                os.makedirs(directory, exist_ok=True)
+                # written under a temp name first, so a reader never sees a half written file
+                name = f"{int(time.time() * 1000)}-{self.owner}.parquet"
+                tmp_path = os.path.join(directory, f".{name}.tmp")
+                pq.write_table(pa.Table.from_pylist(part, schema=SCHEMA), tmp_path)
+                os.replace(tmp_path, os.path.join(directory, name))
+
+            with self._lock:
+                self._stats["rows"] += len(rows)
+                self._stats["files"] += len(partitions)
+
+    def _read(self, filters):
+        # rows already on disk plus this worker's unflushed buffer, as one DataFrame
+        tables = []
+        if os.path.isdir(self.path):
+            dataset = ds.dataset(self.path, format="parquet", partitioning=PARTITIONING, schema=DATASET_SCHEMA,
+                                 exclude_invalid_files=True, ignore_prefixes=[".", "_"])
+            tables.append(dataset.to_table(filter=filters))
+
+        with self._lock:
+            buffered = [dict(row, date=date, ticker=ticker) for date, ticker, row in self._buffer]
+        if buffered:
+            table = pa.Table.from_pylist(buffered, schema=DATASET_SCHEMA)
+            tables.append(table.filter(filters) if filters is not None else table)
+
+        if not tables:
+            return DATASET_SCHEMA.empty_table().to_pandas()
+        return pa.concat_tables(tables).to_pandas()
+
+    @staticmethod
+    def _filters(tickers=None, metric=None, source=None, start=None, end=None):
+        # date and ticker are partition keys, so these prune whole directories before any file is opened
+        expressions = []
+        if tickers is not None:
+            expressions.append(ds.field("ticker").isin([ticker.upper() for ticker in tickers]))
+        if metric is not None:
+            expressions.append(ds.field("metric") == metric)
+        if source is not None:
+            expressions.append(ds.field("source") == source)
+        if start is not None:
+            expressions.append(ds.field("date") >= pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            expressions.append(ds.field("date") <= pd.Timestamp(end).strftime("%Y-%m-%d"))
+        return functools.reduce(operator.and_, expressions) if expressions else None
+
+    def _check_enabled(self):
+        if pa is None:
+            raise RuntimeError("pyarrow is not installed, snapshot history is unavailable")
+        if not self.enabled:
+            raise RuntimeError("Snapshot history is disabled (STOCKS_SNAPSHOT_DIR is empty)")
+
+    def history(self, ticker: str, metric: str, source: str=None, start=None, end=None):
+        # one metric of one ticker over time, oldest first
+        self._check_enabled()
+        frame = self._read(self._filters([ticker], metric, source, start, end))
+        return frame.sort_values("scraped_at")[["scraped_at", "source", "metric", "value", "text"]].reset_index(drop=True)
+
+    def metrics(self, ticker: str, source: str=None):
+        # the metric names recorded for a ticker, per source
+        self._check_enabled()
+        frame = self._read(self._filters([ticker], source=source))
+        return frame.groupby("source")["metric"].unique().map(sorted).to_dict()
+
+    def screen(self, metric: str, source: str=None, on=None, min_value: float=None, max_value: float=None,
+               tickers: list=None, lookback_days: int=None):
+        # cross-ticker screen: each ticker's latest value of a metric as of a day, highest first
+        self._check_enabled()
+        end = pd.Timestamp(on) if on is not None else pd.Timestamp.now(tz="UTC")
+        start = end - pd.Timedelta(days=lookback_days or tickers_constants.SNAPSHOT_SCREEN_LOOKBACK_DAYS)
+        frame = self._read(self._filters(tickers, metric, source, start, end))
+        latest = frame.sort_values("scraped_at").drop_duplicates(["ticker", "source"], keep="last")
+        if min_value is not None:
+            latest = latest[latest["value"] >= min_value]
+        if max_value is not None:
+            latest = latest[latest["value"] <= max_value]
+        return latest.sort_values("value", ascending=False, na_position="last")[
+            ["ticker", "source", "metric", "value", "text", "scraped_at"]].reset_index(drop=True)
+
+    def compact(self, date: str):
+        # merges one day's small per-flush files into a single file per ticker (run once the day is over)
+        self._check_enabled()
+        self.flush()
+        day = os.path.join(self.path, f"date={date}")
+        if not os.path.isdir(day):
+            return 0
+        merged = 0
+        for ticker_dir in os.listdir(day):
+            directory = os.path.join(day, ticker_dir)
+            files = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                           if name.endswith(".parquet") and not name.startswith("."))
+            if len(files) < 2:
+                continue
+            table = pa.concat_tables([pq.read_table(file, schema=SCHEMA) for file in files])
+            name = f"compacted-{int(time.time() * 1000)}-{self.owner}.parquet"
+            tmp_path = os.path.join(directory, f".{name}.tmp")
+            pq.write_table(table.sort_by("scraped_at"), tmp_path)
+            os.replace(tmp_path, os.path.join(directory, name))
+            for file in files:
+                os.remove(file)
+            merged += len(files)
+        return merged
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, buffered=len(self._buffer), enabled=self.enabled, path=self.path)
+
+
+def default_snapshot_store():
+    # STOCKS_SNAPSHOT_DIR moves the history elsewhere, an empty string turns it off
+    return SnapshotStore(os.environ.get("STOCKS_SNAPSHOT_DIR", tickers_constants.SNAPSHOT_PATH))
+
+
+snapshot_store = default_snapshot_store()
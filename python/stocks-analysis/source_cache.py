@@ -0,0 +1,314 @@
+import os
+import sys
+import time
+import asyncio
+import pickle
+import sqlite3
+import threading
+import functools
+from collections import OrderedDict
+
+import tickers_constants
+
+
+def estimate_size(obj, _seen=None):
+    # rough deep size in bytes - good enough to keep base64 screenshots in check
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v, _seen) for v in obj)
+    return size
+
+
+def is_error_result(result):
+    return not result or (isinstance(result, dict) and ("msg" in result or "error" in result) and len(result) == 1)
+
+
+class DiskCache:
+    # SQLite in WAL mode so several uvicorn workers can share one file
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "source TEXT NOT NULL, ticker TEXT NOT NULL, expires_at REAL NOT NULL, value BLOB NOT NULL, "
+                "PRIMARY KEY (source, ticker))"
+            )
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, source: str, ticker: str):
+        try:
+            row = self._conn().execute(
+                "SELECT expires_at, value FROM entries WHERE source = ? AND ticker = ?", (source, ticker)
+            ).fetchone()
+            if row is None:
+                return None, None
+
+            expires_at, blob = row
+            if expires_at <= time.time():
+                self.delete(source, ticker)
+                return None, None
+
+            return expires_at - time.time(), pickle.loads(blob)
+        except Exception as e:
+            print(f"Disk cache read failed: {e}")
+            return None, None
+
+    def expires_in(self, source: str, ticker: str):
+        # reads only the expiry column, so freshness checks never load or unpickle the value
+        try:
+            row = self._conn().execute(
+                "SELECT expires_at FROM entries WHERE source = ? AND ticker = ?", (source, ticker)
+            ).fetchone()
+        except Exception as e:
+            print(f"Disk cache read failed: {e}")
+            return 0
+        return max(0, row[0] - time.time()) if row is not None else 0
+
+    def set(self, source: str, ticker: str, value, ttl: int):
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            self._conn().execute(
+                "INSERT OR REPLACE INTO entries (source, ticker, expires_at, value) VALUES (?, ?, ?, ?)",
+                (source, ticker, time.time() + ttl, blob)
+            )
+        except Exception as e:
+            print(f"Disk cache write failed: {e}")
+
+    def delete(self, source: str=None, ticker: str=None):
+        query, params = "DELETE FROM entries WHERE 1=1", []
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+        if ticker is not None:
+            query += " AND ticker = ?"
+            params.append(ticker)
+        self._conn().execute(query, params)
+
+
+def default_disk_cache():
+    path = os.environ.get("STOCKS_CACHE_DB", tickers_constants.CACHE_DB_PATH)
+    if not path:
+        return None
+    try:
+        return DiskCache(path)
+    except Exception as e:
+        print(f"Disk cache disabled: {e}")
+        return None
+
+
+class SourceCache:
+    def __init__(self, ttls: dict=None, max_bytes: int=None, error_ttl: int=None, disk: DiskCache=None):
+        self.ttls = ttls if ttls is not None else tickers_constants.CACHE_TTL_SECONDS
+        self.max_bytes = max_bytes if max_bytes is not None else tickers_constants.CACHE_MAX_BYTES
+        self.error_ttl = error_ttl if error_ttl is not None else tickers_constants.CACHE_ERROR_TTL_SECONDS
+        self._entries = OrderedDict()  # (source, ticker) -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {source: self._empty_stats() for source in self.ttls}
+        self.disk = disk
+
+    @staticmethod
+    def _empty_stats():
+        return {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def _key(source: str, ticker: str):
+        return (source, ticker.upper())
+
+    def _count(self, source, stat):
+        self._stats.setdefault(source, self._empty_stats())[stat] += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _get_memory(self, key, record=True):
+        source = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, _, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    if record:
+                        self._count(source, "hits")
+                    return value
+
+                self._drop(key)
+                self._count(source, "expirations")
+        return None
+
+    def _get_disk(self, key, record=True):
+        source = key[0]
+        if self.disk is not None:
+            remaining, value = self.disk.get(*key)
+            if value is not None:
+                self._set_memory(key, value, remaining)
+                if record:
+                    with self._lock:
+                        self._count(source, "disk_hits")
+                return value
+
+        if record:
+            with self._lock:
+                self._count(source, "misses")
+        return None
+
+    def get(self, source: str, ticker: str, record: bool=True):
+        # record=False re-checks an entry the caller has already counted a lookup for, without skewing the stats
+        key = self._key(source, ticker)
+        value = self._get_memory(key, record)
+        return value if value is not None else self._get_disk(key, record)
+
+    async def aget(self, source: str, ticker: str):
+        # memory hits are answered on the loop, the SQLite read and unpickling of a miss go to a thread
+        key = self._key(source, ticker)
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if self.disk is None:
+            return self._get_disk(key)
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def set(self, source: str, ticker: str, value, ttl: int=None):
+        if ttl is None:
+            ttl = self.error_ttl if is_error_result(value) else self.ttls.get(source, tickers_constants.CACHE_DEFAULT_TTL_SECONDS)
+        if ttl <= 0:
+            return
+
+        key = self._key(source, ticker)
+        self._set_memory(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(*key, value, ttl)
+
+    def _set_memory(self, key, value, ttl):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            while self._entries and self._bytes + size > self.max_bytes:
+                (evicted_source, _), (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._count(evicted_source, "evictions")
+
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+
+    def invalidate(self, source: str=None, ticker: str=None):
+        with self._lock:
+            for key in list(self._entries):
+                if (source is None or key[0] == source) and (ticker is None or key[1] == ticker.upper()):
+                    self._drop(key)
+        if self.disk is not None:
+            self.disk.delete(source, ticker.upper() if ticker else None)
+
+    def clear(self, persistent: bool=True):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if persistent and self.disk is not None:
+            self.disk.delete()
+
+    def contains(self, source: str, ticker: str):
+        key = self._key(source, ticker)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return True
+        return self.disk is not None and self.disk.get(*key)[1] is not None
+
+    def expires_in(self, source: str, ticker: str):
+        # seconds of freshness left for an entry, 0 when it is missing or expired
+        key = self._key(source, ticker)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return max(0, entry[0] - time.monotonic())
+        if self.disk is not None:
+            return self.disk.expires_in(*key)
+        return 0
+
+    def stats(self):
+        with self._lock:
+            per_source = {source: dict(stats) for source, stats in self._stats.items()}
+            for stats in per_source.values():
+                hits = stats["hits"] + stats["disk_hits"]
+                lookups = hits + stats["misses"]
+                stats["hit_ratio"] = round(hits / lookups, 3) if lookups else None
+
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk": self.disk.path if self.disk is not None else None,
+                "sources": per_source,
+            }
+
+
+_memos = []
+
+
+def memoize(ttl: int, max_entries: int=256):
+    # bounded, expiring memo for helpers inside the sources; keyed on the arguments after self, so it is
+    # shared across instances and never pins them in memory (unlike functools.lru_cache on a method)
+    def decorator(fn):
+        entries = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(self, *args):
+            key = args
+            with lock:
+                entry = entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    entries.move_to_end(key)
+                    return entry[1]
+
+            value = fn(self, *args)
+
+            with lock:
+                entries[key] = (time.monotonic() + ttl, value)
+                entries.move_to_end(key)
+                while len(entries) > max_entries:
+                    entries.popitem(last=False)
+            return value
+
+        def invalidate(*args):
+            with lock:
+                if args:
+                    entries.pop(args, None)
+                else:
+                    entries.clear()
+
+        wrapper.invalidate = invalidate
+        _memos.append(wrapper)
+        return wrapper
+
+    return decorator
+
+
+def clear_memos():
+    for memo in _memos:
+        memo.invalidate()
@@ -1,29 +1,40 @@
 
-import requests
 from abc import ABC
 import asyncio
-import imgkit
+import os
+import time
 import re
 import random
-import time
-from io import BytesIO
-import base64
-from PIL import Image, ImageOps, ImageFilter, ImageEnhance
+import requests
+from PIL import Image
 from tradingview_ta import TA_Handler, Interval
-from functools import lru_cache
+import copy
 import yfinance as yf
+import pandas as pd
 from datetime import datetime, timedelta
-import pytesseract
 from concurrent.futures import ThreadPoolExecutor
 from finvizfinance.quote import finvizfinance
 from finvizfinance.screener.overview import Overview
 from g4f.client import Client
-import threading
 
 import tickers_constants
-
-pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"
-lock = threading.Lock()
+from source_cache import SourceCache, default_disk_cache, memoize, clear_memos, is_error_result
+from single_flight import SingleFlight, SharedStream
+from shared_store import shared_store
+from http_pool import http_pool
+from rate_limit import rate_limiter, CircuitOpenError
+from render_pool import render_pool
+from ocr_pool import ocr_pool
+from sws_index import SwsIndex, TvExchangeIndex
+from image_store import image_store
+from serialization import normalize
+import metrics
+from prompt_builder import PromptBuilder
+from feed_store import feed_store
+from snapshot_store import snapshot_store
+
+# tradingview_ta reports a non-200 scanner response as "... HTTP status code: 503. ..."
+TV_STATUS_PATTERN = re.compile(r"status code: (\d+)")
 
 
 def get_screen_size():
@@ -33,41 +44,48 @@ def get_screen_size():
     except Exception as e:
         return (1920, 1080)
 
-def get_and_crop_screenshot(url, x, y, w, h, timeout=5000):
-    options = {
-        "javascript-delay": str(timeout),  # wait 5 seconds for JS
-        "no-stop-slow-scripts": "",
-        "enable-javascript": "",
-        "width": "1280",  # or adjust based on your needs
-    }
-
+def get_screenshot_regions(url, regions: dict, timeout=None, wait_for=None):
     width, height = get_screen_size()
 
-    config = imgkit.config(wkhtmltoimage="/usr/bin/wkhtmltoimage") # First install - sudo apt-get install wkhtmltopdf
-
-    img_bytes = imgkit.from_url(url, False, config=config, options=options)
-
     # screen resolution is based on a 1920x1080 size, so we need to adjust for the current screen resolution
     scale_x = width / 1920
     scale_y = height / 1080
-    crop_box = (x * scale_x, y * scale_y, w * scale_x, h * scale_y)
+    crop_boxes = {name: (x * scale_x, y * scale_y, w * scale_x, h * scale_y) for name, (x, y, w, h) in regions.items()}
 
-    full_screenshot = Image.open(BytesIO(img_bytes))
-
-    return full_screenshot, full_screenshot.crop(crop_box)
+    return render_pool.render_regions(url, crop_boxes, wait_for=wait_for, timeout=timeout)
 
 
 def get_display_image(cropped_img: Image):
-    buffer = BytesIO()
-    cropped_img.save(buffer, format="PNG")
-    buffer.seek(0)
-    return base64.b64encode(buffer.read()).decode("utf-8")
+    # summaries only carry the content hash, the PNG itself is served from /img/{hash}
+    return image_store.put_image(cropped_img)
+
+
+class FieldSummary(dict):
+    # summary dict that reports every top-level field as soon as a source sets it
+    def __init__(self, on_field):
+        super().__init__()
+        self.on_field = on_field
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        # the source may keep mutating value, so listeners get a normalized snapshot taken on this thread
+        self.on_field(key, normalize(value))
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
 
 
 class TickerAnalyzer:
     def __init__(self):
         self.curr_ticker = ""
-        self.cache = {"zacks" : {}, "tv" : {}, "yf" : {}, "finviz" : {}, "sws" : {}, "sa" : {}, "rdt" : {}, "chatgpt" : {}}
+        self.cache = SourceCache(disk=default_disk_cache())
+        self.store = shared_store
+        # scrapes get their own threads so slow renders never starve the server's default threadpool
+        threads = int(os.environ.get("STOCKS_SCRAPE_THREADS") or 0) or tickers_constants.SCRAPE_THREADS
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="scrape")
+        self.in_flight = SingleFlight(self.executor)
+        self.analyses = SharedStream()
         self.zacks = self.Zacks()
         self.tv = self.Tradingview()
         self.yf = self.YahooFinance()
@@ -76,124 +94,7 @@ class TickerAnalyzer:
         self.sa = self.StockAnalysis()
         self.rdt = self.Reddit()
         self.chatgpt = self.Chatgpt()
-
-    def clear_cache(self):
-        for source in self.cache.keys():
-            self.cache[source] = {}
-
-    def get_zacks_info(self, ticker: str):
-        if self.cache["zacks"] and ticker in self.cache["zacks"].keys():
-            return self.cache["zacks"][ticker]
-        else:
-            zacks_ret =  self.zacks.get_ticker_info(ticker)
-            if "msg" not in zacks_ret.keys():
-                if len(self.cache["zacks"]) == 20:
-                    lock.acquire()
-                    _, _ = self.cache["zacks"].popitem(last=False)
-                    lock.release()
-                lock.acquire()
-                self.cache["zacks"].update({ticker : zacks_ret})
-                lock.release()
-
-            return zacks_ret
-
-    def get_tradingview_info(self, ticker: str):
-        if self.cache["tv"] and ticker in self.cache["tv"].keys():
-            return self.cache["tv"][ticker]
-        else:
-            tv_ret =  self.tv.get_ticker_info(ticker)
-            if len(self.cache["tv"]) == 20:
-                lock.acquire()
-                _, _ = self.cache["tv"].popitem(last=False)
-                lock.release()
-            lock.acquire()
-            self.cache["tv"].update({ticker : tv_ret})
-            lock.release()
-
-            return tv_ret
-    
-    def get_yf_info(self, ticker: str):
-        if self.cache["yf"] and ticker in self.cache["yf"].keys():
-            return self.cache["yf"][ticker]
-        else:
-            yf_ret = self.yf.get_ticker_info(ticker)
-            if len(self.cache["yf"]) == 20:
-                lock.acquire()
-                _, _ = self.cache["yf"].popitem(last=False)
-                lock.release()
-            lock.acquire()
-            self.cache["yf"].update({ticker : yf_ret})
-            lock.release()
-
-            return yf_ret
-
-    def get_finviz_info(self, ticker: str):
-        if self.cache["finviz"] and ticker in self.cache["finviz"].keys():
-            return self.cache["finviz"][ticker]
-        else:
-            finviz_ret = self.finviz.get_ticker_info(ticker)
-            if len(self.cache["finviz"]) == 20:
-                lock.acquire()
-                _, _ = self.cache["finviz"].popitem(last=False)
-                lock.release()
-            lock.acquire()
-            self.cache["finviz"].update({ticker : finviz_ret})
-            lock.release()
-
-            return finviz_ret
-
-    def get_sws_info(self, ticker: str):
-        if self.cache["sws"] and ticker in self.cache["sws"].keys():
-            return self.cache["sws"][ticker]
-        else:
-            sws_ret = self.sws.get_ticker_info(ticker)
-            if len(self.cache["sws"]) == 20:
-                lock.acquire()
-                _, _ = self.cache["sws"].popitem(last=False)
-                lock.release()
-            lock.acquire()
-            self.cache["sws"].update({ticker : sws_ret})
-            lock.release()
-
-            return sws_ret
-        
-    def get_sa_info(self, ticker: str):
-        if self.cache["sa"] and ticker in self.cache["sa"].keys():
-            return self.cache["sa"][ticker]
-        else:
-            sa_ret = self.sa.get_ticker_info(ticker)
-            if len(self.cache["sa"]) == 20:
-                lock.acquire()
-                _, _ = self.cache["sa"].popitem(last=False)
-                lock.release()
-            lock.acquire()
-            self.cache["sa"].update({ticker : sa_ret})
-            lock.release()
-
-            return sa_ret
-        
-    def get_rdt_info(self, ticker: str):
-        if self.cache["rdt"] and ticker in self.cache["rdt"].keys():
-            return self.cache["rdt"][ticker]
-        else:
-            rdt_ret = self.rdt.get_ticker_info(ticker)
-            if len(self.cache["rdt"]) == 20:
-                lock.acquire()
-                _, _ = self.cache["rdt"].popitem(last=False)
-                lock.release()
-            lock.acquire()
-            self.cache["rdt"].update({ticker : rdt_ret})
-            lock.release()
-
-            return rdt_ret
-
-    async def gather_chatgpt_info(self, ticker: str, finished: dict):
-        if self.cache["chatgpt"] and ticker in self.cache["chatgpt"].keys():
-            return self.cache["chatgpt"][ticker]
-        
-        non_valid_msg = {"msg" : f"{ticker.upper()} is not a valid stock ticker. Please provide a valid stock ticker"}
-        
-        source_methods = {
+        self.sources = {
             "zacks": self.zacks,
             "tv": self.tv,
             "yf": self.yf,
@@ -203,51 +104,224 @@ class TickerAnalyzer:
             "rdt": self.rdt
         }
 
-        futures = {}
-        non_valid_count = 0
+    def clear_cache(self, persistent: bool=False):
+        # the disk tier is kept by default so a new session still starts warm, TTLs bound its staleness
+        self.cache.clear(persistent=persistent)
+        clear_memos()
+
+    def cache_stats(self):
+        return dict(self.cache.stats(), in_flight=self.in_flight.stats(), prompts=self.chatgpt.prompts.stats(),
+                    analyses=self.analyses.stats(), feeds=feed_store.stats(), snapshots=snapshot_store.stats())
+
+    def _lookup(self, source: str, ticker: str, on_field=None):
+        # every scrape goes through here, so it is timed per source and the pools can attribute their stages to it
+        with metrics.source_timer(source) as timer:
+            result = self.sources[source].lookup(ticker, on_field)
+            # normalized once here so cache hits are served without another pass
+            with metrics.stage("normalize"):
+                result = normalize(result)
+            timer.outcome = "error" if is_error_result(result) else "ok"
+            if timer.outcome == "ok":
+                with metrics.stage("snapshot"):
+                    snapshot_store.append(source, ticker, result)
+
+        return result
+
+    @staticmethod
+    def _lease_key(source: str, ticker: str):
+        return f"scrape:{source}:{ticker.upper()}"
+
+    def _lead_or_wait(self, source: str, ticker: str):
+        # cross-worker single-flight: returns None once this process holds the scrape lease (or gave up waiting
+        # for it and scrapes anyway), or the result another worker stored while we waited
+        key = self._lease_key(source, ticker)
+        deadline = time.monotonic() + tickers_constants.SCRAPE_LEASE_SECONDS
+        while not self.store.lease(key, tickers_constants.SCRAPE_LEASE_SECONDS):
+            if time.monotonic() >= deadline:
+                # the holder keeps renewing or is stuck; releasing a lease we don't own is a no-op
+                break
+            time.sleep(tickers_constants.SCRAPE_LEASE_POLL_SECONDS)
+
+        # the previous holder stores its result before releasing the lease
+        if self.cache.contains(source, ticker):
+            self.store.release(key)
+            return self.cache.get(source, ticker, record=False)
+        return None
+
+    def _fetch_source_info(self, source: str, ticker: str, on_field=None):
+        # another caller may have filled the cache while we waited to lead the flight
+        cached = self.cache.get(source, ticker, record=False)
+        if cached is not None:
+            return cached
+
+        if self.store is None:
+            result = self._lookup(source, ticker, on_field)
+            self.cache.set(source, ticker, result)
+            return result
+
+        cached = self._lead_or_wait(source, ticker)
+        if cached is not None:
+            return cached
+        try:
+            result = self._lookup(source, ticker, on_field)
+            self.cache.set(source, ticker, result)
+        finally:
+            self.store.release(self._lease_key(source, ticker))
+
+        return result
+
+    def _refresh_source_info(self, source: str, ticker: str):
+        # when another worker is already scraping this entry its result is as fresh as ours would be
+        if self.store is not None and not self.store.lease(self._lease_key(source, ticker), tickers_constants.SCRAPE_LEASE_SECONDS):
+            return self.cache.get(source, ticker, record=False)
+
+        try:
+            result = self._lookup(source, ticker)
+            # a failed refresh keeps serving the previous good entry until it expires
+            if not is_error_result(result) or not self.cache.contains(source, ticker):
+                self.cache.set(source, ticker, result)
+        finally:
+            if self.store is not None:
+                self.store.release(self._lease_key(source, ticker))
+
+        return result
+
+    async def refresh_source_info(self, source: str, ticker: str):
+        # re-scrapes even when cached (stale-while-revalidate), still coalesced with other callers
+        return await self.in_flight.ado((source, ticker.upper()), self._refresh_source_info, source, ticker)
+
+    def _get_source_info(self, source: str, ticker: str):
+        cached = self.cache.get(source, ticker)
+        if cached is not None:
+            return cached
+
+        return self.in_flight.do((source, ticker.upper()), self._fetch_source_info, source, ticker)
+
+    async def aget_source_info(self, source: str, ticker: str, on_field=None):
+        # on_field(key, value) is called from the scraping thread as each summary field is filled in,
+        # only when this call actually runs the scrape (not on cache hits or when joining another caller)
+        cached = await self.cache.aget(source, ticker)
+        if cached is not None:
+            return cached
+
+        try:
+            return await self.in_flight.ado((source, ticker.upper()), self._fetch_source_info, source, ticker, on_field)
+        except Exception as e:
+            result = {"error": str(e)}
+            await asyncio.to_thread(self.cache.set, source, ticker, result)
+            return result
 
-        loop = asyncio.get_event_loop()
+    def get_zacks_info(self, ticker: str):
+        return self._get_source_info("zacks", ticker)
 
-        for source, obj in source_methods.items():
-            if ticker not in self.cache[source]:
-                futures[source] = asyncio.create_task(asyncio.to_thread(obj.get_ticker_info, ticker))
-            else:
-                finished[source] = True
-        
-        while futures:
-            to_remove = []
-            for source, future in futures.items():
-                if future.done():
-                    finished[source] = True
-                    try:
-                        result = future.result()
-                        if result == non_valid_msg:
-                            non_valid_count+=1
-                        self.cache[source][ticker] = result
-                    except Exception as e:
-                        error_result = {"error": str(e)}
-                        self.cache[source][ticker] = error_result
+    def get_tradingview_info(self, ticker: str):
+        return self._get_source_info("tv", ticker)
 
-                    to_remove.append(source)
+    def get_yf_info(self, ticker: str):
+        return self._get_source_info("yf", ticker)
 
-            for source in to_remove:
-                futures.pop(source)
+    def get_finviz_info(self, ticker: str):
+        return self._get_source_info("finviz", ticker)
 
-            await asyncio.sleep(0.1)
+    def get_sws_info(self, ticker: str):
+        return self._get_source_info("sws", ticker)
 
-        if non_valid_count == len(source_methods):
-            non_valid_count = 0
-            return non_valid_msg
+    def get_sa_info(self, ticker: str):
+        return self._get_source_info("sa", ticker)
 
-        non_valid_count = 0
+    def get_rdt_info(self, ticker: str):
+        return self._get_source_info("rdt", ticker)
+
+    async def gather_chatgpt_info(self, ticker: str, progress: asyncio.Queue=None):
+        # every source alias is put on the progress queue the moment it finishes, followed by a None sentinel
+        try:
+            non_valid_msg = {"msg" : f"{ticker.upper()} is not a valid stock ticker. Please provide a valid stock ticker"}
+
+            async def run_source(source):
+                return source, await self.aget_source_info(source, ticker)
+
+            results = {}
+            for next_done in asyncio.as_completed([run_source(source) for source in self.sources]):
+                source, result = await next_done
+                results[source] = result
+                self._report_progress(progress, source)
+
+            non_valid_count = sum(1 for result in results.values() if result == non_valid_msg)
+
+            if non_valid_count == len(self.sources):
+                return non_valid_msg
+
+            return [results[source] for source in self.sources]
+        finally:
+            self._report_progress(progress, None)
+
+    async def stream_analysis(self, ticker: str, sources_data: list):
+        # a finished analysis is replayed while its inputs are unchanged; otherwise the caller joins the generation
+        # already running for the same inputs, or starts it
+        fingerprint = self.chatgpt.fingerprint(ticker, *sources_data)
+        cached = await self.cache.aget("chatgpt", ticker)
+        if cached is not None and cached.get("fingerprint") == fingerprint:
+            for chunk in cached["chunks"]:
+                yield chunk
+            return
+
+        async for chunk in self.analyses.subscribe(fingerprint, lambda: self._generate_analysis(ticker, sources_data, fingerprint)):
+            yield chunk
+
+    def _generate_analysis(self, ticker: str, sources_data: list, fingerprint: str):
+        chunks = []
+        for chunk in self.chatgpt.get_ticker_info(ticker, *sources_data):
+            chunks.append(chunk)
+            yield chunk
+        # only complete analyses are kept
+        self.cache.set("chatgpt", ticker, {"fingerprint": fingerprint, "chunks": chunks})
+
+    async def analyze_batch(self, tickers: list, sources: list=None, max_concurrency: int=None, source_concurrency: dict=None):
+        # yields (ticker, source, result) as each lookup completes, bounded globally and per source
+        sources = sources or list(self.sources)
+        unknown = [source for source in sources if source not in self.sources]
+        if unknown:
+            raise ValueError(f"Unknown sources: {', '.join(unknown)}")
+
+        # a partial override keeps the tuned limits of the other sources
+        source_concurrency = {**tickers_constants.BATCH_SOURCE_CONCURRENCY, **(source_concurrency or {})}
+        global_limit = asyncio.Semaphore(max_concurrency or tickers_constants.BATCH_MAX_CONCURRENCY)
+        source_limits = {
+            source: asyncio.Semaphore(source_concurrency.get(source, tickers_constants.BATCH_MAX_CONCURRENCY))
+            for source in sources
+        }
 
-        return [self.cache[source][ticker] for source in source_methods]
+        async def run_one(ticker, source):
+            async with source_limits[source], global_limit:
+                return ticker, source, await self.aget_source_info(source, ticker)
+
+        unique_tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        tasks = [asyncio.create_task(run_one(ticker, source)) for ticker in unique_tickers for source in sources]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _report_progress(progress: asyncio.Queue, source):
+        if progress is not None:
+            progress.put_nowait(source)
     
 
     class Source(ABC):
         def __init__(self):
             self.ticker = None
             self.summary = dict()
+
+        def lookup(self, ticker: str, on_field=None):
+            # each lookup runs on its own copy, so summary/ticker state never leaks between tickers or threads
+            call = copy.copy(self)
+            call.ticker = None
+            call.summary = FieldSummary(on_field) if on_field else dict()
+            result = call.get_ticker_info(ticker)
+            return dict(result) if isinstance(result, FieldSummary) else result
     
     class Zacks(Source):
         def get_ticker_info(self, ticker: str):
@@ -257,14 +331,15 @@ class TickerAnalyzer:
 
             url = f"https://quote-feed.zacks.com/index.php?t={self.ticker}"
 
-            if not self._is_valid_zacks_ticker(url, self.ticker):
+            # a single quote-feed request both validates the ticker and carries the data
+            data = self._get_zacks_quote(url, self.ticker)
+
+            if data is None:
                 self.summary = {"msg" : f"{ticker.upper()} is not a valid stock ticker. Please provide a valid stock ticker"}
             else:
                 try:
                     image = self._get_zacks_styles_score_image(self.ticker)
 
-                    response = requests.get(url=url)
-                    data = dict(response.json())[self.ticker]
                     data_dict.update({"name" : data["name"]})
                     data_dict.update({"ticker" : data["ticker"]})
                     data_dict.update({"zacks rank" : f"{data['zacks_rank']} ({data['zacks_rank_text']})"})
@@ -275,70 +350,125 @@ class TickerAnalyzer:
                     data_dict.update({"dividend" : data["source"]["sungard"]["dividend"]})
                     data_dict.update({"image" : image})
 
-                    self.summary = data_dict
+                    # update, not replace, so a streaming FieldSummary reports every field
+                    self.summary.update(data_dict)
             
                 except Exception as e:
                     self.summary = {"msg" : f"{e}. Please provide a valid stock ticker."}
 
             return self.summary
         
-        def _is_valid_zacks_ticker(self, url: str, ticker: str):
+        def _get_zacks_quote(self, url: str, ticker: str):
             headers = {"User-Agent": "Mozilla/5.0"}
             try:
-                res = requests.get(url, headers=headers, timeout=5)
-                data = res.json()
-                return False if "error" in data[ticker].keys() else True
+                res = http_pool.get(url, headers=headers, timeout=5)
+                data = dict(res.json())[ticker]
+                return None if "error" in data.keys() else data
             except Exception as e:
-                return False
+                return None
         
         def _get_zacks_styles_score_image(self, ticker: str):
             url = f"https://www.zacks.com/stock/quote/{ticker}?q={ticker}"
 
-            _, cropped_img = get_and_crop_screenshot(url, 330, 180, 1145, 480)
+            _, crops = get_screenshot_regions(url, {"style scores": (330, 180, 1145, 480)})
 
-            return get_display_image(cropped_img)
+            return get_display_image(crops["style scores"])
 
 
     class Tradingview(Source):
+        SCANNER_HOST = "scanner.tradingview.com"
+
         def __init__(self):
             super().__init__()
             self.exchange  = tickers_constants.TV_STOCKS_EXCHAGE
+            self.index = TvExchangeIndex()
 
-        @lru_cache(maxsize=128)
         def get_ticker_info(self, ticker: str):
             self.ticker = ticker.upper()
-            error_429 = False
-            for ex, region in self.exchange.items():
-                try:
-                    handler = TA_Handler(
-                        symbol=self.ticker,
-                        exchange=ex,
-                        screener=region,
-                        interval=Interval.INTERVAL_1_MONTH,
-                    )
-
-                    analysis = handler.get_analysis()
-
-                    self._get_tv_stats_from_image(self.ticker, ex, analysis)
-
-                    self.summary.update({"Analysis" : analysis.summary})
+            error_429, failed = False, False
+            try:
+                exchange, analysis = self._resolve_exchange(self.ticker)
+            except CircuitOpenError:
+                exchange, analysis, error_429 = None, None, True
+            except Exception as e:
+                exchange, analysis, error_429, failed = None, None, "429" in str(e), True
 
-                except Exception as e:
-                    time.sleep(1)
-                    if "429" in str(e):
-                        error_429 = True
-                        break
-                    else:
-                        continue
+            if analysis is not None:
+                self._get_tv_stats_from_image(self.ticker, exchange, analysis)
+                self.summary.update({"Analysis" : analysis.summary})
 
             if not self.summary:
                 if error_429:
                     self.summary = {"msg" : "Too many requets to Tradingview's server. Service is temporarly blocked for your IP."}
+                elif failed:
+                    self.summary = {"msg" : f"{ticker.upper()} retrieval failed."}
                 else:
                     self.summary = {"msg" : f"{ticker.upper()} is not a valid stock ticker. Please provide a valid stock ticker"}
 
             return self.summary
-        
+
+        def _probe_exchange(self, ticker: str, exchange: str):
+            handler = TA_Handler(
+                symbol=ticker,
+                exchange=exchange,
+                screener=self.exchange[exchange],
+                interval=Interval.INTERVAL_1_MONTH,
+            )
+
+            rate_limiter.acquire(self.SCANNER_HOST)
+            try:
+                analysis = handler.get_analysis()
+            except requests.RequestException:
+                # timeouts and connection errors count towards the scanner's circuit breaker
+                rate_limiter.record(self.SCANNER_HOST, error=True)
+                raise
+            except Exception as e:
+                status = TV_STATUS_PATTERN.search(str(e))
+                if status is None:
+                    # "Exchange or symbol not found": the scanner answered, the symbol just isn't listed there
+                    rate_limiter.record(self.SCANNER_HOST, 200)
+                    return None
+                status = int(status.group(1))
+                rate_limiter.record(self.SCANNER_HOST, status)
+                if status == 429 or status >= 500:
+                    raise
+                return None
+            rate_limiter.record(self.SCANNER_HOST, 200)
+            return analysis
+
+        def _resolve_exchange(self, ticker: str):
+            entry = self.index.get(ticker)
+            if entry is not None and entry["exchange"] in self.exchange:
+                analysis = self._probe_exchange(ticker, entry["exchange"])
+                if analysis is not None:
+                    return entry["exchange"], analysis
+                self.index.drop(ticker)
+
+            # probe every exchange at once; the first hit in TV_STOCKS_EXCHAGE order wins so listings
+            # on several exchanges resolve the same way every time
+            executor = ThreadPoolExecutor(max_workers=len(self.exchange))
+            probe = metrics.propagate(self._probe_exchange)
+            futures = {ex: executor.submit(probe, ticker, ex) for ex in self.exchange}
+            failure = None
+            try:
+                for ex, future in futures.items():
+                    try:
+                        analysis = future.result()
+                    except Exception as e:
+                        # one exchange failing doesn't stop a lower-priority one from answering
+                        failure = e
+                        continue
+                    if analysis is not None:
+                        self.index.set(ticker, ex)
+                        return ex, analysis
+            finally:
+                # don't wait on the probes of lower-priority exchanges once there is a winner
+                executor.shutdown(wait=False, cancel_futures=True)
+
+            # without a winner a failed probe means "unknown", not "not listed"
+            if failure is not None:
+                raise failure
+            return None, None
 
         def _adjust_ks_string(self, ks_string_list, key_stats):
             index = 2
@@ -363,14 +493,13 @@ class TickerAnalyzer:
                             key_stats[ks_string_list[index]] = ks_string_list[index+1]
                             index = index + 2
         
-        def _render_imgkit(self, url, config, options, crop_box, str, shared, analysis=None):
+        def _render_page(self, url, crop_box, str, shared, analysis=None):
             try:
-                img_bytes = imgkit.from_url(url, False, config=config, options=options)
-
-                cropped_img = Image.open(BytesIO(img_bytes)).crop(crop_box)
+                _, crops = render_pool.render_regions(url, {str: crop_box})
+                cropped_img = crops[str]
 
                 if str == "forecast":
-                    text = pytesseract.image_to_string(cropped_img)
+                    text = ocr_pool.image_to_string(cropped_img)
                     match = re.search(r"\d+\.\d+", text)
                     if match:
                         price_target = float(match.group())
@@ -381,7 +510,7 @@ class TickerAnalyzer:
                         shared["Potential %"] = f"{potential}%"
 
                 else:
-                    text = pytesseract.image_to_string(cropped_img)
+                    text = ocr_pool.image_to_string(cropped_img)
                     
                     pattern = r"(Key stats.*?(?:Beta \(1Y\)|Expense ratio)[^\d\-]*[-+]?\d*\.?\d+)"
                     match = re.search(pattern, text, re.DOTALL)
@@ -404,16 +533,6 @@ class TickerAnalyzer:
             url = f"https://www.tradingview.com/symbols/{exchange}-{ticker}/"
             forecast_url = url + "forecast/"
 
-            options = {
-                "javascript-delay": "5000",
-                "load-error-handling": "ignore",
-                "no-stop-slow-scripts": "",
-                "enable-javascript": "",
-                "width": "1280",  # or adjust based on your needs
-            }
-
-            config = imgkit.config(wkhtmltoimage="/usr/bin/wkhtmltoimage")
-
             stats_and_price_target = {}
 
             width, height = get_screen_size()
@@ -423,14 +542,14 @@ class TickerAnalyzer:
 
             with ThreadPoolExecutor() as executor:
                 future_ks  = executor.submit(
-                    self._render_imgkit,
-                    url, config, options,
+                    metrics.propagate(self._render_page),
+                    url,
                     (15 * scale_x, 1375 * scale_y, 315 * scale_x, 2600 * scale_y),
                     "ks", stats_and_price_target
                 )
                 future_forecast = executor.submit(
-                    self._render_imgkit,
-                    forecast_url, config, options,
+                    metrics.propagate(self._render_page),
+                    forecast_url,
                     (19 * scale_x, 654 * scale_y, 199 * scale_x, 732 * scale_y),
                     "forecast", stats_and_price_target, analysis
                 )
@@ -452,11 +571,16 @@ class TickerAnalyzer:
                 self.ticker = yf.Ticker(ticker_uppercase)
                 for attr in dir(self.ticker):
                     if attr in self.attributes and not attr == "news":
-                        attr_value = getattr(self.ticker, attr)
-                        self._not_news_attr_handeling(attr, attr_value, ticker_uppercase)
+                        with metrics.stage("http"):
+                            attr_value = getattr(self.ticker, attr)
+                        with metrics.stage("pandas"):
+                            self._not_news_attr_handeling(attr, attr_value, ticker_uppercase)
                         
                     elif attr == "news":
-                        self._news_attr_handeling(attr)
+                        with metrics.stage("pandas"):
+                            self._news_attr_handeling(attr, ticker_uppercase)
+
+                self._get_otm_calls()
         
             except Exception as e:
                 print(f"Error msg: {e}.")
@@ -469,49 +593,46 @@ class TickerAnalyzer:
             
             return self.summary
         
-        def _news_attr_handeling(self, attr):
-            recent_news_dict = {}
-            for news in getattr(self.ticker, attr):
-                content = news["content"]
-                curr_date = datetime.now()
-                year, month, _ = content["pubDate"].split("-")
-                if (int(year) == curr_date.year or (int(year) == curr_date.year - 1 and abs(curr_date.month -  int(month)) > 6)):
-                    for key in ["id", "description", "displayTime", "isHosted", 
-                                "bypassModal", "previewUrl", "thumbnail", "provider", 
-                                "clickThroughUrl", "metadata", "finance", "storyline"]:
-                        _ = content.pop(key)
-
-                    content_type = content.pop("contentType")
-                    raw_url_data = content.pop("canonicalUrl")
-                    content["url"] = raw_url_data["url"]
-                    recent_news_dict.update({content_type : content})
-
-
-            news = {
-                str(k): v for k, v in recent_news_dict.items()
-            }
-            self.summary.update({"News" : news})
+        @staticmethod
+        def _trim_news(news):
+            content = dict(news["content"])
+            for key in ["id", "description", "displayTime", "isHosted", 
+                        "bypassModal", "previewUrl", "thumbnail", "provider", 
+                        "clickThroughUrl", "metadata", "finance", "storyline", "contentType"]:
+                content.pop(key, None)
+
+            raw_url_data = content.pop("canonicalUrl", None) or {}
+            content["url"] = raw_url_data.get("url")
+            return content
+
+        def _news_attr_handeling(self, attr, ticker_uppercase):
+            raw_news = getattr(self.ticker, attr) or []
+            since = datetime.now() - timedelta(days=tickers_constants.YF_NEWS_DAYS)
+            items = feed_store.ingest(
+                ticker_uppercase, "yf_news", raw_news,
+                [news["content"].get("pubDate") for news in raw_news], since,
+                key=lambda content: content.get("title"), convert=self._trim_news,
+            )
+            self.summary.update({"News" : {str(date): content for date, content in items}})
         
-        def _upgrades_downgrades(self, attr_value):
-                upgrades_dict = attr_value.to_dict(orient="index")
-                recent_upgrades_dict = {}
-                for date, values in upgrades_dict.items():
-                    if date.year >= datetime.now().year - 1:
-                        recent_upgrades_dict.update({date : values})
-
-                upgrades = {
-                    str(k): v for k, v in recent_upgrades_dict.items()
-                }
+        def _upgrades_downgrades(self, attr_value, ticker_uppercase):
+                since = datetime(datetime.now().year - 1, 1, 1)
+                items = feed_store.ingest(
+                    ticker_uppercase, "yf_upgrades_downgrades", attr_value, attr_value.index, since,
+                    key=lambda values: values.get("Firm"),
+                )
 
-                self.summary.update({"Upgrades & downgrades" : upgrades})
+                self.summary.update({"Upgrades & downgrades" : {str(date): values for date, values in items}})
 
 
         def _recommendations(self, attr_value):
-            self.summary.update({"recommendations" : {}})
+            recommendations = {}
             recommendations_dict = attr_value.to_dict(orient="index")
             for (key, value) in recommendations_dict.items():
                 _ = value.pop("period")
-                self.summary["recommendations"].update({f"{key}-Month" : value})
+                recommendations.update({f"{key}-Month" : value})
+            # set once complete, a streamed field is only ever sent in its final state
+            self.summary.update({"recommendations" : recommendations})
 
 
         def _analyst_price_targets(self, attr_value, ticker_uppercase):
@@ -532,13 +653,11 @@ class TickerAnalyzer:
             if attr == "analyst_price_targets":
                 self._analyst_price_targets(attr_value, ticker_uppercase)
 
-            self._get_otm_calls()
-
             if attr == "recommendations_summary":
                 self._recommendations(attr_value)
 
             elif attr == "upgrades_downgrades":
-                self._upgrades_downgrades(attr_value)
+                self._upgrades_downgrades(attr_value, ticker_uppercase)
 
 
         def _get_otm_calls(self, otm_threshold: float=1.2):
@@ -551,29 +670,24 @@ class TickerAnalyzer:
             cutoff = datetime.today() + timedelta(days=60)
             valid_expirations = [d for d in expirations if datetime.strptime(d, "%Y-%m-%d") <= cutoff]
 
-            results = []
-
-            index = 0
-
-            for exp in valid_expirations:
+            def fetch_calls(exp):
                 try:
-                    calls = self.ticker.option_chain(exp).calls
-                    for i in range(len(calls["strike"])):
-                        strike = float(calls["strike"][i])
-                        if strike > current_price * otm_threshold:
-                            index += 1
-                            option = { str(index) :
-                                {"strike": str(strike),
-                                "expiration": exp,
-                                "volume": str(calls["volume"][i]),
-                                "openInterest": str(calls["openInterest"][i]),
-                                "lastPrice": str(calls["lastPrice"][i])}
-                            }
-
-                            results.append(option)
+                    return self.ticker.option_chain(exp).calls.assign(expiration=exp)
                 except Exception as e:
                     print(f"Error retrieving options for {exp}: {e}")
-                    continue
+                    return None
+
+            with ThreadPoolExecutor(max_workers=tickers_constants.YF_OPTIONS_CONCURRENCY) as executor:
+                chains = [calls for calls in executor.map(metrics.propagate(fetch_calls), valid_expirations) if calls is not None]
+
+            columns = ["strike", "expiration", "volume", "openInterest", "lastPrice"]
+            if chains:
+                calls = pd.concat(chains, ignore_index=True)
+                otm = calls.loc[calls["strike"] > current_price * otm_threshold, columns]
+                otm = otm.astype(object).where(otm.notna(), None)
+                results = {column: otm[column].tolist() for column in columns}
+            else:
+                results = {column: [] for column in columns}
 
             self.summary.update({"Options flow (Deep OTM)" : results})
 
@@ -581,7 +695,8 @@ class TickerAnalyzer:
     class Finviz(Source):       
         def get_ticker_info(self, ticker: str):
             try:
-                stock = finvizfinance(ticker.upper())
+                with metrics.stage("http"):
+                    stock = finvizfinance(ticker.upper())
 
                 try:
                     fundament = stock.ticker_fundament()
@@ -600,13 +715,13 @@ class TickerAnalyzer:
 
                 try:
                     ratings_outer = stock.ticker_outer_ratings()
-                    self._upgrades_downgrades(curr_date, ratings_outer)
+                    self._upgrades_downgrades(ticker, curr_date, ratings_outer)
                 except:
                     pass
 
                 try:
                     news = stock.ticker_news()
-                    self._news(curr_date, news)
+                    self._news(ticker, curr_date, news)
                 except:
                     pass
 
@@ -633,95 +748,98 @@ class TickerAnalyzer:
             return self.summary
 
         
-        def _news(self, curr_date, news_raw):
-            news_dict = news_raw.to_dict(orient="index")
-            recent_news_dict = {}
-            
-            for key, news in news_dict.items():
-                date = news.pop("Date")
-                news_year = date.year
-                news_month = date.month
-                news_day = date.day
-
-                if ((int(news_year) == curr_date.year and int(news_month) == curr_date.month and abs(int(news_day) - curr_date.day) <= 3) or 
-                    (int(news_month) == curr_date.month - 1 and abs(curr_date.day -  int(news_day)) > 28) or
-                    (int(news_year) == curr_date.year - 1 and news_month == 12 and abs(curr_date.day -  int(news_day)) > 28)):
-                        recent_news_dict.update({date : news})
-
-            news = {
-                str(k): v for k, v in recent_news_dict.items()
-            }
+        def _news(self, ticker, curr_date, news_raw):
+            # a real time window, so the days around a month or year boundary are no longer dropped
+            since = curr_date - timedelta(days=tickers_constants.FINVIZ_NEWS_DAYS)
+            items = feed_store.ingest(
+                ticker, "finviz_news", news_raw.drop(columns="Date"), news_raw["Date"], since,
+                key=lambda news: news.get("Title"),
+            )
 
-            self.summary.update({"News" : news})
+            self.summary.update({"News" : {str(date): news for date, news in items}})
 
         
-        def _upgrades_downgrades(self, curr_date, ratings_outer):
-            upgrades_dict = ratings_outer.to_dict(orient="index")
-            recent_upgrades_dict = {}
-            for key, values in upgrades_dict.items():
-                date = values.pop("Date")
-                updgrade_downgrade_year = int(date.year)
-                if updgrade_downgrade_year >= curr_date.year - 1:
-                    recent_upgrades_dict.update({date : values})
-
-            upgrades = {
-                str(k): v for k, v in recent_upgrades_dict.items()
-            }
+        def _upgrades_downgrades(self, ticker, curr_date, ratings_outer):
+            since = datetime(curr_date.year - 1, 1, 1)
+            items = feed_store.ingest(
+                ticker, "finviz_ratings", ratings_outer.drop(columns="Date"), ratings_outer["Date"], since,
+                key=lambda values: values.get("Outer"),
+            )
 
-            self.summary.update({"Upgrades/Downgrades" : upgrades})
+            self.summary.update({"Upgrades/Downgrades" : {str(date): values for date, values in items}})
 
     class SimplyWallStreet(Source):
-        @lru_cache(maxsize=128)       
-        def get_ticker_info(self, ticker: str):
-            base_url = "https://simplywall.st/en/stocks/us"
-            try:
-                for industry in tickers_constants.SWS_INDUSTRIES:
-                    for us_mkt in tickers_constants.SWS_US_MARKETS:
-                        company_name = yf.Ticker(ticker).info["shortName"].lower()
-                        adjusted_cpmpany_name = self._normalize_company_name(company_name)
-                        adjusted_cpmpany_name = adjusted_cpmpany_name.replace(",", "").replace(".", "").replace("&", "").replace(" ", "-").replace("--", "-")
-                        adjusted_cpmpany_name = adjusted_cpmpany_name[:-1] if adjusted_cpmpany_name[-1] == "-" else adjusted_cpmpany_name
+        BASE_URL = "https://simplywall.st/en/stocks/us"
 
-                        url = f"{base_url}/{industry}/{us_mkt}-{ticker.lower()}/{adjusted_cpmpany_name}"
-
-                        if not self._is_valid_simplywallstreet_url(url, random.choice(tickers_constants.USER_AGENTS_LIST)):
-                            continue
+        def __init__(self):
+            super().__init__()
+            self.index = SwsIndex()
 
-                        full_screenshot, cropped_img = get_and_crop_screenshot(url, 344, 712, 1175, 1490)
+        def get_ticker_info(self, ticker: str):
+            try:
+                url = self._find_ticker_url(ticker)
+                if url:
+                    _, crops = get_screenshot_regions(url, {"snapshot": (344, 712, 1175, 1490)})
+                    cropped_img = crops["snapshot"]
 
-                        width, height = cropped_img.size
-                        mid_height = height // 2 
+                    width, height = cropped_img.size
+                    mid_height = height // 2 
 
-                        bottom_half = cropped_img.crop((0, mid_height, width, height))
+                    bottom_half = cropped_img.crop((0, mid_height, width, height))
 
-                        gray = bottom_half.convert("L")
-                        sharpened = gray.filter(ImageFilter.SHARPEN)
-                        contrast = ImageEnhance.Contrast(sharpened).enhance(2.0)
-                        inverted = ImageOps.invert(contrast)
-                        binarized = inverted.point(lambda x: 255 if x > 128 else 0, mode="1")
-                        binarized = binarized.resize((binarized.width * 2, binarized.height * 2))
-                        text = pytesseract.image_to_string(binarized)
-                        text_dict = self._extract_sections(text)
+                    text = ocr_pool.image_to_string(bottom_half, preprocess="text")
+                    text_dict = self._extract_sections(text)
 
-                        if text_dict:
-                            top_half = cropped_img.crop((0, 0, width, mid_height))
+                    if text_dict:
+                        top_half = cropped_img.crop((0, 0, width, mid_height))
 
-                            if "Rewards" in text_dict.keys():
-                                self.summary.update({"Rewards" : text_dict["Rewards"]})
-                            if "Risk Analysis" in text_dict.keys():
-                                self.summary.update({"Risk Analysis" : text_dict["Risk Analysis"]})
+                        if "Rewards" in text_dict.keys():
+                            self.summary.update({"Rewards" : text_dict["Rewards"]})
+                        if "Risk Analysis" in text_dict.keys():
+                            self.summary.update({"Risk Analysis" : text_dict["Risk Analysis"]})
 
-                            self.summary.update({"image" : get_display_image(top_half)})
-                        else:
-                            self.summary.update({"OCR error:" : "OCR retrieval was not successful"})
+                        self.summary.update({"image" : get_display_image(top_half)})
+                    else:
+                        # the indexed page may have moved - rediscover it next time
+                        self.index.drop(ticker)
+                        self.summary.update({"OCR error:" : "OCR retrieval was not successful"})
 
-                        return self.summary
+                    return self.summary
             except Exception as e:
                 pass
                 
             if not self.summary:
                 return {"msg" : f"{ticker.upper()} is not a valid stock ticker. Please provide a valid stock ticker"}
 
+        def _ticker_url(self, ticker: str, industry: str, market: str, slug: str):
+            return f"{self.BASE_URL}/{industry}/{market}-{ticker.lower()}/{slug}"
+
+        def _find_ticker_url(self, ticker: str):
+            entry = self.index.get(ticker)
+            if entry:
+                return self._ticker_url(ticker, entry["industry"], entry["market"], entry["slug"])
+
+            slug = self._company_slug(ticker)
+            candidates = {
+                self._ticker_url(ticker, industry, us_mkt, slug): (industry, us_mkt)
+                for industry in tickers_constants.SWS_INDUSTRIES
+                for us_mkt in tickers_constants.SWS_US_MARKETS
+            }
+
+            headers = {"User-Agent": random.choice(tickers_constants.USER_AGENTS_LIST)}
+            url, _ = http_pool.find_first(list(candidates), self._is_valid_simplywallstreet_response, headers=headers, timeout=5)
+            if url:
+                industry, us_mkt = candidates[url]
+                self.index.set(ticker, industry, us_mkt, slug)
+
+            return url
+
+        @memoize(ttl=tickers_constants.SWS_INDEX_MAX_AGE_SECONDS)
+        def _company_slug(self, ticker: str):
+            company_name = yf.Ticker(ticker).info["shortName"].lower()
+            adjusted_cpmpany_name = self._normalize_company_name(company_name)
+            adjusted_cpmpany_name = adjusted_cpmpany_name.replace(",", "").replace(".", "").replace("&", "").replace(" ", "-").replace("--", "-")
+            return adjusted_cpmpany_name[:-1] if adjusted_cpmpany_name[-1] == "-" else adjusted_cpmpany_name
 
         def _normalize_company_name(self, name):
             pattern = r"\b(?:" + "|".join(tickers_constants.COMMON_SUFFIXES) + r")\b\.?,?"
@@ -729,17 +847,9 @@ class TickerAnalyzer:
             return name
         
 
-        def _is_valid_simplywallstreet_url(self, url: str, user_agent: str):
-            headers = {"User-Agent": user_agent}
-            try:
-                response = requests.get(url, headers=headers, timeout=5)
-
-                if response.status_code == 404 or "Sorry, this page was not found" in response.text:
-                    return False
-
-                return True
-            except requests.RequestException:
-                return False
+        @staticmethod
+        def _is_valid_simplywallstreet_response(response):
+            return response.status_code != 404 and "Sorry, this page was not found" not in response.text
         
         def _extract_sections(self, text):
             lines = text.strip().splitlines()
@@ -771,9 +881,9 @@ class TickerAnalyzer:
             try:
                 url = f"https://stockanalysis.com/stocks/{ticker.lower()}/forecast/"
 
-                full_screenshot, cropped_img = get_and_crop_screenshot(url, 23, 1173, 1191, 1690)
+                _, crops = get_screenshot_regions(url, {"forecast": (23, 1173, 1191, 1690), "chart": (23, 1173, 1191, 2650)})
 
-                text = pytesseract.image_to_string(cropped_img)
+                text = ocr_pool.image_to_string(crops["forecast"])
                 
                 if text:
                     lines = text.splitlines()
@@ -784,7 +894,7 @@ class TickerAnalyzer:
                         self.summary.update({"Price target" : price_target.split(": ", 1)[1]})
                     if analysts_consensus:
                         self.summary.update({"Analyst consensus" : analysts_consensus.split(": ", 1)[1]})
-                    self.summary.update({"image" : get_display_image(full_screenshot.crop((23, 1173, 1191, 2650)))})
+                    self.summary.update({"image" : get_display_image(crops["chart"])})
                 else:
                     self.summary = {"msg" : f"{ticker.upper()} retrieval failed."}
             except Exception as e:
@@ -808,25 +918,16 @@ class TickerAnalyzer:
                 "Connection": "keep-alive"
             }
 
-            proxies = {
-                "http": "socks5h://127.0.0.1:9050",
-                "https": "socks5h://127.0.0.1:9050"
-            }
+            proxy = "socks5h://127.0.0.1:9050"
 
             try:
-                response = requests.get(
+                response = http_pool.get(
                     reddit_url,
                     headers=headers,
-                    proxies=proxies,
+                    proxy=proxy,
                     timeout=15
                 )
 
-                if response.status_code == 429:
-                    import os
-                    os.system("systemctl restart tor@default")
-                    time.sleep(1.5)
-                    response = requests.get(reddit_url, headers=headers, proxies=proxies, timeout=15)
-
                 if response.status_code != 200:
                     return {"error": f"Failed to fetch Reddit posts. Status: {response.status_code}"}
 
@@ -846,36 +947,28 @@ class TickerAnalyzer:
         
 
     class Chatgpt:
-        def _format_dict(self, name: str, data: dict) -> str:
-            if not data:
-                return f"## {name} Data:\nNo data available.\n"
-            
-            formatted = f"## {name} Data:\n"
-            for key, value in data.items():
-                formatted += f"- {key}: {value}\n"
-            return formatted + "\n"
+        def __init__(self):
+            self.prompts = PromptBuilder()
+
+        def _prepare(self, ticker: str, zacks: dict, tv: dict, yf: dict, finviz: dict, sws: dict, sa: dict, rdt: dict):
+            # ranked, truncated and stripped of images/links to fit PROMPT_TOKEN_BUDGET, cached per input fingerprint
+            return self.prompts.build(ticker, {
+                "Zacks": zacks,
+                "TradingView": tv,
+                "Yahoo Finance": yf,
+                "Finviz": finviz,
+                "SimplyWallStreet": sws,
+                "StockAnalysis": sa,
+                "Reddit": rdt,
+            })
 
         def _build_prompt(self, ticker: str, zacks: dict, tv: dict, yf: dict, finviz: dict, sws: dict, sa: dict, rdt: dict) -> str:
-            sections = [
-                self._format_dict("Zacks", zacks),
-                self._format_dict("TradingView", tv),
-                self._format_dict("Yahoo Finance", yf),
-                self._format_dict("Finviz", finviz),
-                self._format_dict("SimplyWallStreet", sws),
-                self._format_dict("StockAnalysis", sa),
-                self._format_dict("Reddit", rdt)
-            ]
-
-            return f"""You are a professional financial analyst. Analyze the stock {ticker.upper()}
-            using the following structured data from {len(sections)} sources: {"".join(sections)}. 
-            Please provide:
-            1. A concise summary of the stock's financial and technical status.
-            2. Key strengths and weaknesses found in the data.
-            3. A clear investment recommendation (e.g., Strong Buy, Buy, Hold, Sell, Strong Sell).
-            4. A one-sentence justification for your recommendation.
-            Make sure you keep you answer for each clause up to 5 lines.
-            Remember to mention in capital letters that what you provide is not a financial advice before you analysis.
-            """
+            prompt, _ = self._prepare(ticker, zacks, tv, yf, finviz, sws, sa, rdt)
+            return prompt
+
+        def fingerprint(self, ticker: str, zacks: dict, tv: dict, yf: dict, finviz: dict, sws: dict, sa: dict, rdt: dict):
+            _, fingerprint = self._prepare(ticker, zacks, tv, yf, finviz, sws, sa, rdt)
+            return fingerprint
 
         def _send_prompt(self, ticker, prompt):
             if not prompt:
@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import threading
+
+import tickers_constants
+
+
+class TickerIndex:
+    # persistent ticker -> resolved-location map (shared between workers through a JSON file)
+    def __init__(self, path: str, max_age: int):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = None
+        self._mtime = None
+
+    def _load(self):
+        # re-read when another worker has rewritten the file
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+
+        if self._entries is None or mtime != self._mtime:
+            try:
+                with open(self.path, "r") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+            self._mtime = mtime
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def get(self, ticker: str):
+        with self._lock:
+            self._load()
+            entry = self._entries.get(ticker.upper())
+            if entry is None or time.time() - entry["resolved_at"] > self.max_age:
+                return None
+            return entry
+
+    def set(self, ticker: str, **fields):
+        with self._lock:
+            self._load()
+            self._entries[ticker.upper()] = dict(fields, resolved_at=time.time())
+            self._save()
+
+    def drop(self, ticker: str):
+        with self._lock:
+            self._load()
+            if self._entries.pop(ticker.upper(), None) is not None:
+                self._save()
+
+
+class SwsIndex(TickerIndex):
+    # ticker -> (industry, market, slug) so SimplyWallStreet URLs are discovered only once
+    def __init__(self, path: str=None, max_age: int=None):
+        super().__init__(path or tickers_constants.SWS_INDEX_PATH,
+                         max_age or tickers_constants.SWS_INDEX_MAX_AGE_SECONDS)
+
+    def set(self, ticker: str, industry: str, market: str, slug: str):
+        super().set(ticker, industry=industry, market=market, slug=slug)
+
+
+class TvExchangeIndex(TickerIndex):
+    # ticker -> TradingView exchange, so the exchange probe runs once per ticker
+    def __init__(self, path: str=None, max_age: int=None):
+        super().__init__(path or tickers_constants.TV_EXCHANGE_INDEX_PATH,
+                         max_age or tickers_constants.TV_EXCHANGE_INDEX_MAX_AGE_SECONDS)
+
+    def set(self, ticker: str, exchange: str):
+        super().set(ticker, exchange=exchange)
@@ -1,3 +1,5 @@
+from datetime import time as dt_time
+
 USER_AGENTS_LIST = [
   'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/13.1.1 Safari/605.1.15',
   'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:77.0) Gecko/20100101 Firefox/77.0',
@@ -47,4 +49,160 @@ SWS_INDUSTRIES = ['tech', 'automobiles', 'banks', 'capital-goods', 'commercial-s
 COMMON_SUFFIXES = [
     "inc", "inc.", "corp", "corp.", "corporation", "ltd", "ltd.", "llc", "plc", "gmbh", "ag", "s.a.", "n.v.", 
     "oy", "ab", "a/s", "s.r.l.", "s.p.a.", "pty ltd", "limited", "llp", ","
-]
\ No newline at end of file
+]
+
+# Seconds a scraped source summary stays fresh in the TickerAnalyzer cache
+CACHE_TTL_SECONDS = {
+    "zacks": 60 * 60,
+    "tv": 30 * 60,
+    "yf": 5 * 60,           # options flow goes stale quickly
+    "finviz": 30 * 60,
+    "sws": 24 * 60 * 60,    # SimplyWallStreet snapshots are daily
+    "sa": 6 * 60 * 60,
+    "rdt": 60 * 60,
+    "chatgpt": 60 * 60,
+}
+CACHE_DEFAULT_TTL_SECONDS = 15 * 60
+CACHE_ERROR_TTL_SECONDS = 60
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Persistent cache tier shared by all workers (override with STOCKS_CACHE_DB, empty string disables)
+CACHE_DB_PATH = ".ticker_cache.db"
+
+# Pooled HTTP clients - max concurrent requests (and kept-alive connections) per upstream host
+HTTP_HOST_CONCURRENCY = {
+    "quote-feed.zacks.com": 8,
+    "www.reddit.com": 2,
+    "simplywall.st": 8,
+}
+HTTP_DEFAULT_CONCURRENCY = 8
+HTTP_TIMEOUT_SECONDS = 15
+
+# Headless render pool (playwright Chromium, falls back to wkhtmltoimage)
+RENDER_POOL_SIZE = 3
+RENDER_WIDTH = 1280
+RENDER_TIMEOUT_MS = 15000           # max wait for the page load / selector
+RENDER_IDLE_TIMEOUT_MS = 2500       # max wait for network idle when no selector is given
+RENDER_FALLBACK_DELAY_MS = 5000     # fixed JS delay for wkhtmltoimage
+WKHTMLTOIMAGE_PATH = "/usr/bin/wkhtmltoimage"  # First install - sudo apt-get install wkhtmltopdf
+RENDER_PAGE_CACHE_SECONDS = 120     # full-page bitmaps are reused by later crops of the same URL
+RENDER_PAGE_CACHE_ENTRIES = 16
+
+# OCR process pool
+TESSERACT_PATH = "/usr/bin/tesseract"
+OCR_WORKERS = None          # None = one worker per core
+OCR_CACHE_ENTRIES = 512     # OCR text cached by crop content hash
+
+# Multi-worker mode: scrapes run on their own threads and are coordinated between processes through the
+# disk cache's SQLite file (only when STOCKS_WORKERS > 1, see run_workers.sh)
+SCRAPE_THREADS = 16
+SCRAPE_LEASE_SECONDS = 120          # longer than the slowest scrape, a crashed worker's lease expires after this
+SCRAPE_LEASE_POLL_SECONDS = 0.25
+WATCHLIST_LEADER_LEASE_SECONDS = 300   # one worker refreshes each source, renewed before every refresh
+
+# Batch analysis fan-out - max lookups in flight overall and per source (render-heavy sources get fewer)
+BATCH_MAX_CONCURRENCY = 8
+BATCH_SOURCE_CONCURRENCY = {
+    "zacks": 3,
+    "tv": 2,
+    "yf": 4,
+    "finviz": 4,
+    "sws": 2,
+    "sa": 2,
+    "rdt": 1,
+}
+BATCH_MAX_TICKERS = 500
+
+# Yahoo Finance options expirations fetched in parallel per ticker
+YF_OPTIONS_CONCURRENCY = 6
+
+# SimplyWallStreet URL discovery index
+SWS_INDEX_PATH = ".sws_index.json"
+SWS_INDEX_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+TV_EXCHANGE_INDEX_PATH = ".tv_exchange_index.json"
+TV_EXCHANGE_INDEX_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+# Content-addressed screenshot store served from /img/{hash}
+IMAGE_STORE_DIR = ".image_store"
+IMAGE_STORE_MAX_BYTES = 64 * 1024 * 1024            # memory tier
+IMAGE_STORE_MAX_DISK_BYTES = 1024 * 1024 * 1024      # directory, least recently used files (by mtime) go first
+IMAGE_STORE_MAX_AGE_SECONDS = 2 * 24 * 60 * 60       # well past the longest cache TTL that can still reference an image
+IMAGE_STORE_PRUNE_INTERVAL_SECONDS = 60 * 60         # expired files are swept at most this often, oversize sweeps right away
+IMAGE_VARIANT_QUALITY = 80      # WebP/AVIF re-encode quality
+
+# Watchlist refresher - pinned tickers (or STOCKS_WATCHLIST="AAPL,NVDA,...") are re-scraped before their cache entries expire
+WATCHLIST = []
+WATCHLIST_REFRESH_MARGIN = 0.2              # refresh once less than 20% of a source's TTL is left
+WATCHLIST_MARKET_HOURS = (dt_time(9, 0), dt_time(16, 30))   # America/New_York, Mon-Fri, with some slack around the bell
+WATCHLIST_IDLE_SECONDS = 60
+WATCHLIST_DEFAULT_SPACING_SECONDS = 5
+WATCHLIST_SOURCE_SPACING_SECONDS = {        # min gap between two refreshes against the same upstream
+    "zacks": 5,
+    "tv": 15,
+    "yf": 3,
+    "finviz": 5,
+    "sws": 20,
+    "sa": 10,
+    "rdt": 30,
+}
+WATCHLIST_RETRY_BASE_SECONDS = 60           # a failed refresh is retried after 1, 2, 4, ... minutes
+WATCHLIST_RETRY_MAX_SECONDS = 60 * 60
+
+# Adaptive per-host rate limiting: (requests per second, burst); halved on 429/503, recovers on success
+RATE_LIMITS = {
+    "quote-feed.zacks.com": (4, 4),
+    "www.zacks.com": (1, 2),
+    "scanner.tradingview.com": (6, 12),    # bursts cover a cold probe of every exchange at once
+    "www.tradingview.com": (1, 2),
+    "www.reddit.com": (0.5, 1),
+    "simplywall.st": (8, 16),
+    "stockanalysis.com": (1, 2),
+}
+RATE_LIMIT_DEFAULT = (2, 4)
+RATE_LIMIT_MIN_RATE = 0.05
+RATE_LIMIT_RECOVERY = 0.05          # fraction of the max rate regained per successful request
+HTTP_MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 30
+CIRCUIT_FAILURE_THRESHOLD = 5       # consecutive failures before a host is paused
+CIRCUIT_COOLDOWN_SECONDS = 60
+
+METRICS_SOURCE_BUCKETS = (0.05, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+METRICS_STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+# Incremental news/ratings feeds: per ticker watermark plus a bounded window of recent items
+FEED_MAX_ITEMS = 50
+FEED_MAX_FEEDS = 4000
+FINVIZ_NEWS_DAYS = 3
+YF_NEWS_DAYS = 180
+
+PROMPT_TOKEN_BUDGET = 2500          # whole prompt, shared between the sources
+PROMPT_CHARS_PER_TOKEN = 4
+PROMPT_MAX_ITEMS = 5                # newest rows kept per table (news, ratings, insiders, options, discussions)
+PROMPT_MAX_STRING_CHARS = 240
+PROMPT_MIN_FIELD_CHARS = 80         # don't bother truncating a field into less than this
+PROMPT_CACHE_ENTRIES = 256
+PROMPT_DROP_FIELDS = {"image", "chart", "url", "link", "links", "permalink", "thumbnail", "ocr error:"}
+PROMPT_FIELD_PRIORITY = {
+    "Zacks": ["zacks rank", "Forward P/E", "dividend_yield", "dividend", "dividend_freq", "name"],
+    "TradingView": ["Analysis", "Price target", "Potential %", "Last closing price", "Key stats"],
+    "Yahoo Finance": ["Price target", "recommendations", "Upgrades & downgrades", "News", "Options flow (Deep OTM)"],
+    "Finviz": ["General info", "Upgrades/Downgrades", "Insiders trading", "News"],
+    "SimplyWallStreet": ["Risk Analysis", "Rewards"],
+    "StockAnalysis": ["Price target", "Analyst consensus"],
+    "Reddit": ["Top discussions"],
+}
+
+# Historical snapshots: every fresh scrape is appended to Parquet files under date=/ticker= partitions
+SNAPSHOT_PATH = ".snapshots"
+SNAPSHOT_FLUSH_ROWS = 2000          # buffered rows written together, fewer and bigger files
+SNAPSHOT_FLUSH_SECONDS = 300
+SNAPSHOT_MAX_DEPTH = 3              # "Key stats.Market capitalization" is depth 2
+SNAPSHOT_MAX_FIELDS = 40            # nested dicts bigger than this are tables (news, insiders), not metrics
+SNAPSHOT_MAX_TEXT_CHARS = 120
+SNAPSHOT_SCREEN_LOOKBACK_DAYS = 7
+SNAPSHOT_SKIP_FIELDS = {"image", "chart", "url", "link", "links", "ocr error:", "news", "upgrades & downgrades",
+                        "upgrades/downgrades", "insiders trading", "top discussions", "options flow (deep otm)",
+                        "rewards", "risk analysis", "msg", "error"}
+
+BENCH_FIXTURES_PATH = ".bench_fixtures.pkl"
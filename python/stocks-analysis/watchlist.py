@@ -0,0 +1,109 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import tickers_constants
+from source_cache import is_error_result
+
+MARKET_TZ = ZoneInfo("America/New_York")
+
+
+def market_is_open(now: datetime=None):
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    open_time, close_time = tickers_constants.WATCHLIST_MARKET_HOURS
+    return now.weekday() < 5 and open_time <= now.time() <= close_time
+
+
+def default_watchlist():
+    tickers = os.environ.get("STOCKS_WATCHLIST")
+    if tickers is not None:
+        return [ticker.strip().upper() for ticker in tickers.split(",") if ticker.strip()]
+    return list(tickers_constants.WATCHLIST)
+
+
+class WatchlistRefresher:
+    # keeps pinned tickers warm: each source gets its own worker that refreshes entries before their TTL runs out,
+    # one at a time with a minimum spacing, so every upstream host sees a steady trickle instead of a burst
+    def __init__(self, analyzer, tickers: list=None, sources: list=None):
+        self.analyzer = analyzer
+        self.tickers = tickers if tickers is not None else default_watchlist()
+        self.sources = sources or list(analyzer.sources)
+        self._tasks = []
+        self._failures = {}  # (source, ticker) -> (consecutive failures, monotonic time of the next attempt)
+
+    def _refresh_margin(self, source):
+        return self.analyzer.cache.ttls.get(source, tickers_constants.CACHE_DEFAULT_TTL_SECONDS) * tickers_constants.WATCHLIST_REFRESH_MARGIN
+
+    def _due(self, source):
+        margin = self._refresh_margin(source)
+        now = time.monotonic()
+        return [ticker for ticker in self.tickers
+                if self._failures.get((source, ticker), (0, 0))[1] <= now
+                and self.analyzer.cache.expires_in(source, ticker) <= margin]
+
+    def _record(self, source, ticker, ok):
+        # failed entries (kept stale, short lived errors, invalid tickers) stay due, so they back off instead
+        # of being re-scraped on every pass
+        if ok:
+            self._failures.pop((source, ticker), None)
+            return
+        failures = self._failures.get((source, ticker), (0, 0))[0] + 1
+        delay = min(tickers_constants.WATCHLIST_RETRY_MAX_SECONDS, tickers_constants.WATCHLIST_RETRY_BASE_SECONDS * 2 ** (failures - 1))
+        self._failures[(source, ticker)] = (failures, time.monotonic() + delay)
+
+    def _is_leader(self, source):
+        # with several workers only the one holding the source's lease refreshes it
+        store = self.analyzer.store
+        return store is None or store.lease(f"watchlist:{source}", tickers_constants.WATCHLIST_LEADER_LEASE_SECONDS)
+
+    async def _run_source(self, source):
+        spacing = tickers_constants.WATCHLIST_SOURCE_SPACING_SECONDS.get(source, tickers_constants.WATCHLIST_DEFAULT_SPACING_SECONDS)
+        while True:
+            if not market_is_open():
+                await asyncio.sleep(tickers_constants.WATCHLIST_IDLE_SECONDS)
+                continue
+
+            # expiry reads and lease writes are SQLite calls, run them off the event loop
+            due = await asyncio.to_thread(self._due, source)
+            if not due or not await asyncio.to_thread(self._is_leader, source):
+                await asyncio.sleep(tickers_constants.WATCHLIST_IDLE_SECONDS)
+                continue
+
+            for ticker in due:
+                if not await asyncio.to_thread(self._is_leader, source):
+                    break
+                try:
+                    result = await self.analyzer.refresh_source_info(source, ticker)
+                    self._record(source, ticker, not is_error_result(result))
+                except Exception as e:
+                    self._record(source, ticker, False)
+                    print(f"Watchlist refresh of {source}/{ticker} failed: {e}")
+                await asyncio.sleep(spacing)
+
+    def start(self):
+        if self.tickers and not self._tasks:
+            self._tasks = [asyncio.create_task(self._run_source(source)) for source in self.sources]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self):
+        return {
+            "tickers": self.tickers,
+            "sources": self.sources,
+            "running": bool(self._tasks),
+            "market_open": market_is_open(),
+            "backing_off": {
+                f"{source}/{ticker}": {"failures": failures, "retry_in_seconds": round(max(0, retry_at - time.monotonic()))}
+                for (source, ticker), (failures, retry_at) in list(self._failures.items())
+            },
+            "fresh_for_seconds": {
+                ticker: {source: round(self.analyzer.cache.expires_in(source, ticker)) for source in self.sources}
+                for ticker in self.tickers
+            },
+        }